@@ -65,6 +65,7 @@ INSTALLED_APPS = [
 ADMIN_TOOLS_INDEX_DASHBOARD = 'MusicEventOrg.dashboard.CustomIndexDashboard'
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'MusicEventOrg.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -125,6 +126,21 @@ DATABASES = {
     }
 }
 
+# Cache
+# Template fragments go to their own alias (see MusicEventOrg/caching.py). Both stay in
+# process memory by default; to share fragments between server processes switch to
+# MusicEventOrg.caching.FileBasedFragmentCache with a directory as LOCATION.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'MusicEventOrg.caching.LocMemFragmentCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -180,6 +196,8 @@ REST_FRAMEWORK = {
         'anon': '100/day',
         'user': '1000/day',
     },
+    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'PAGE_SIZE': 10,  # Number of items per page
 }
 
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
@@ -187,17 +205,71 @@ LOGIN_REDIRECT_URL = '/'  # Redirect to the homepage after login
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 # LOGOUT_REDIRECT_URL = 'logged-out'
 
-REST_FRAMEWORK = {
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
-    'PAGE_SIZE': 10,  # Number of items per page
-}
-
 ESEWA_CONFIG = {
     'merchant_code': os.getenv('ESEWA_MERCHANT_CODE'),  # Replace with your eSewa merchant code
     'payment_url': 'https://uat.esewa.com.np/epay/main',  # Test environment URL
     'verification_url': 'https://uat.esewa.com.np/epay/transrec',  # Test verification URL
     'callback_url': 'http://yourdomain.com/esewa/callback/',  # Replace with your callback URL
 }
+ESEWA_VERIFY_TIMEOUT = 10  # seconds
+
+# Minutes an unpaid ticket keeps its seat while the eSewa/PayPal checkout completes
+TICKET_HOLD_MINUTES = int(os.getenv('TICKET_HOLD_MINUTES', 10))
+
+# Background job queue (see MusicEventOrg/jobs.py and the run_workers command)
+JOB_WORKER_PROCESSES = int(os.getenv('JOB_WORKER_PROCESSES', 2))
+JOB_MAX_ATTEMPTS = 5
+JOB_LEASE_SECONDS = 300  # a running job whose worker died is claimed again after this long
+
+# Keys for the HMAC-signed ticket QR codes, by key id. To rotate, add a new key,
+# point TICKET_SIGNING_KEY_ID at it and drop the old one once its tickets have expired.
+TICKET_SIGNING_KEYS = {
+    'v1': os.getenv('TICKET_SIGNING_KEY_V1') or SECRET_KEY or '',
+}
+TICKET_SIGNING_KEY_ID = os.getenv('TICKET_SIGNING_KEY_ID', 'v1')
+TICKET_TOKEN_GRACE_HOURS = 24  # tokens stay valid this long after the event starts
+
+# Gate check-ins are buffered in memory and written back in batches of this size / age
+CHECKIN_FLUSH_SIZE = 200
+CHECKIN_FLUSH_SECONDS = 2
+
+# Sparrow SMS gateway and notification outbox (see MusicEventOrg/notifications.py)
+SPARROW_SMS_URL = os.getenv('SPARROW_SMS_URL', 'http://api.sparrowsms.com/v2/sms/')
+SPARROW_SMS_TOKEN = os.getenv('SPARROW_SMS_TOKEN')
+SPARROW_SMS_FROM = os.getenv('SPARROW_SMS_FROM', 'YourCompany')
+SPARROW_SMS_TIMEOUT = 10  # seconds
+NOTIFICATION_MAX_ATTEMPTS = 6
+NOTIFICATION_RETRY_BASE_SECONDS = 30  # doubled after every failed attempt
+
+# Responses smaller than this aren't worth compressing (brotli is used if installed, else gzip)
+COMPRESSION_MIN_BYTES = 1024
+
+# Widths (px) of the WebP/JPEG copies made of event and performer images (see MusicEventOrg/images.py)
+IMAGE_DERIVATIVE_WIDTHS = [320, 640, 1280]
+IMAGE_DERIVATIVE_QUALITY = 80
+
+# How long each process may show cached admin dashboard counters before rereading them
+SITE_COUNTERS_CACHE_SECONDS = 60
+
+# Rows fetched per round trip by the streaming CSV/JSONL exports
+EXPORT_CHUNK_SIZE = 2000
+
+# Admin changelists on PostgreSQL show the planner's row estimate instead of an exact COUNT(*) above this
+ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Width/height in pixels of the QR code thumbnails shown in the ticket admin
+QR_THUMBNAIL_SIZE = 100
+
+# Days of daily sales the sell-through forecast fits its trend to
+FORECAST_HISTORY_DAYS = 28
+
+# Dynamic pricing: default bounds relative to the price at first repricing, largest change per run,
+# days of sales that set the demand rate, and the unit prices are rounded to
+PRICING_FLOOR_RATIO = 0.7
+PRICING_CEILING_RATIO = 2.0
+PRICING_MAX_STEP = 0.1
+PRICING_WINDOW_DAYS = 7
+PRICING_ROUND_TO = 10
 
 PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID')  # Replace with your sandbox Client ID
 PAYPAL_SECRET = os.getenv('PAYPAL_SECRET')        # Replace with your sandbox Secret
@@ -1,10 +1,84 @@
+import json
+
+from django.conf import settings
 from django.contrib import admin
 from django.contrib.admin import AdminSite
+from django.core.files.storage import default_storage
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.functional import cached_property
 from django.utils.html import format_html
-from .models import Venue, Event, Ticket, Payment, Festival, Performer, Review
+from . import counters, exports, jobs, ratings, settlement
+from .models import Venue, Event, Ticket, Payment, Festival, Performer, Review, Job, PriceHistory
+from .utils import qr_thumbnail_name
 from rest_framework.authtoken.models import Token
 from django.contrib.auth.admin import UserAdmin  # Import UserAdmin
 from django.contrib.auth.models import User, Group
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    On PostgreSQL, counts changelist rows from the planner's estimate once it is above
+    ADMIN_EXACT_COUNT_LIMIT, so large tables don't pay for a COUNT(*) on every page.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql':
+            if not queryset.query.where:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                                   [queryset.model._meta.db_table])
+                    row = cursor.fetchone()
+                estimate = int(row[0]) if row else -1
+            else:
+                estimate = json.loads(queryset.explain(format='json'))[0]['Plan']['Plan Rows']
+            if estimate > settings.ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+        return super().count
+
+
+class EventListFilter(admin.SimpleListFilter):
+    """
+    Filter by event without listing every event: offers the next upcoming ones,
+    and any other event can be chosen with ?event=<id>.
+    """
+    title = 'event'
+    parameter_name = 'event'
+    event_path = 'event'
+    limit = 15
+
+    def lookups(self, request, model_admin):
+        choices = list(Event.objects.filter(date__gte=timezone.now()).order_by('date')
+                       .values_list('pk', 'title')[:self.limit])
+        selected = self.value()
+        if selected and selected.isdigit() and int(selected) not in dict(choices):
+            choices += Event.objects.filter(pk=selected).values_list('pk', 'title')
+        return [(str(pk), title) for pk, title in choices]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        if not self.value().isdigit():
+            return queryset.none()
+        return queryset.filter(**{f'{self.event_path}_id': self.value()})
+
+
+class TicketEventListFilter(EventListFilter):
+    event_path = 'ticket__event'
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow to millions of rows."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # skips the second, unfiltered COUNT(*)
+
+
 @admin.register(Venue)
 class VenueAdmin(admin.ModelAdmin):
     list_display = ('name', 'address')
@@ -12,34 +86,99 @@ class VenueAdmin(admin.ModelAdmin):
 
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
-    list_display = ('title', 'date', 'venue', 'price')
+    list_display = ('title', 'date', 'venue', 'price', 'projected_sellout', 'projected_attendance')
     list_filter = ('date', 'venue')  # Add filters
+    list_select_related = ('venue', 'forecast')
     search_fields = ('title', 'venue__name')  # Search by title or venue name
 
+    # Filled in by the forecast_sales command
+    def projected_sellout(self, obj):
+        forecast = getattr(obj, 'forecast', None)
+        if forecast is None:
+            return '-'
+        return forecast.projected_sellout_date or 'Not expected'
+    projected_sellout.short_description = "Projected sell-out"
+    projected_sellout.admin_order_field = 'forecast__projected_sellout_date'
+
+    def projected_attendance(self, obj):
+        forecast = getattr(obj, 'forecast', None)
+        return f'{forecast.projected_attendance} / {obj.total_seats}' if forecast else '-'
+    projected_attendance.short_description = "Projected attendance"
+    projected_attendance.admin_order_field = 'forecast__projected_attendance'
+
 @admin.register(Ticket)
-class TicketAdmin(admin.ModelAdmin):
+class TicketAdmin(LargeTableAdmin):
     list_display = ('user', 'event', 'seat_number', 'is_paid', 'qr_code_preview')
-    list_filter = ('is_paid', 'event')  # Filter by payment status and event
+    list_filter = ('is_paid', EventListFilter)  # Filter by payment status and event
+    list_select_related = ('user', 'event')
+    autocomplete_fields = ('user', 'event')
     search_fields = ('user__username', 'event__title')  # Search by user or event
-    actions = ['mark_as_paid']  # Add custom action
+    actions = ['mark_as_paid', 'mark_as_complimentary', 'export_csv', 'export_attendees_csv']  # Add custom action
 
     def qr_code_preview(self, obj):
-        """Display a preview of the QR code."""
+        """Display a thumbnail of the QR code, falling back to the full image for codes made before thumbnails."""
         if obj.qr_code:
-            return format_html('<img src="{}" width="50" height="50" />', obj.qr_code.url)
+            return format_html(
+                '<a href="{1}"><img src="{0}" width="50" height="50" loading="lazy" '
+                'onerror="this.onerror=null;this.src=\'{1}\'" /></a>',
+                default_storage.url(qr_thumbnail_name(obj.qr_code.name)), obj.qr_code.url)
         return "No QR Code"
     qr_code_preview.short_description = "QR Code"
 
     def mark_as_paid(self, request, queryset):
-        """Mark selected tickets as paid."""
-        queryset.update(is_paid=True)
-    mark_as_paid.short_description = "Mark selected tickets as paid"
+        """Settle selected tickets as box-office sales at the event price."""
+        self.settle(request, queryset, 'box_office')
+    mark_as_paid.short_description = "Mark selected tickets as paid (box office)"
+
+    def mark_as_complimentary(self, request, queryset):
+        self.settle(request, queryset, 'comp', complimentary=True)
+    mark_as_complimentary.short_description = "Issue selected tickets as complimentary"
+
+    def settle(self, request, queryset, payment_method, complimentary=False):
+        settled, batch = settlement.settle(queryset, payment_method, complimentary)
+        url = reverse(f'{self.admin_site.name}:MusicEventOrg_ticket_settlement', args=[batch])
+        self.message_user(request, format_html(
+            '{} tickets marked as paid. Their QR codes are being generated: <a href="{}">progress</a>.', settled, url))
+
+    def get_urls(self):
+        return [
+            path('settlement/<str:batch>/', self.admin_site.admin_view(self.settlement_progress),
+                 name='MusicEventOrg_ticket_settlement'),
+        ] + super().get_urls()
+
+    def settlement_progress(self, request, batch):
+        counts = jobs.progress(batch)
+        total = sum(counts.values())
+        return TemplateResponse(request, 'admin/MusicEventOrg/ticket/settlement_progress.html', {
+            **self.admin_site.each_context(request),
+            'title': 'QR code generation',
+            'opts': self.model._meta,
+            'counts': counts,
+            'total': total,
+            'finished': counts['done'] + counts['failed'],
+            'percent': round(100 * (counts['done'] + counts['failed']) / total) if total else 100,
+        })
+
+    def export_csv(self, request, queryset):
+        return exports.export_response(queryset, 'tickets')
+    export_csv.short_description = "Export selected tickets as CSV"
+
+    def export_attendees_csv(self, request, queryset):
+        return exports.export_response(queryset.filter(is_paid=True), 'attendees')
+    export_attendees_csv.short_description = "Export attendee list (paid tickets) as CSV"
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ('ticket', 'amount', 'payment_method', 'transaction_id', 'timestamp')
-    list_filter = ('payment_method', 'timestamp')  # Add filters
+    list_filter = ('payment_method', 'timestamp', TicketEventListFilter)  # Add filters
+    list_select_related = ('ticket__user', 'ticket__event')
+    raw_id_fields = ('ticket',)
     search_fields = ('ticket__user__username', 'transaction_id')  # Search by user or transaction ID
+    actions = ['export_csv']
+
+    def export_csv(self, request, queryset):
+        return exports.export_response(queryset, 'payments')
+    export_csv.short_description = "Export selected payments as CSV"
 
 @admin.register(Performer)
 class PerformerAdmin(admin.ModelAdmin):
@@ -53,11 +192,50 @@ class FestivalAdmin(admin.ModelAdmin):
     search_fields = ('title', 'organizer__username')  # Search by title or organizer
 
 @admin.register(Review)
-class ReviewAdmin(admin.ModelAdmin):
+class ReviewAdmin(LargeTableAdmin):
     list_display = ('user', 'event', 'rating', 'created_at')
-    list_filter = ('rating', 'created_at')  # Add filters
+    list_filter = ('rating', 'created_at', EventListFilter)  # Add filters
+    list_select_related = ('user', 'event')
+    autocomplete_fields = ('user', 'event')
     search_fields = ('user__username', 'event__title')  # Search by user or event
 
+    # Keep the event rating aggregates in step with edits made here
+    def save_model(self, request, obj, form, change):
+        with transaction.atomic():
+            if change:
+                old = Review.objects.values_list('event_id', 'rating').get(pk=obj.pk)
+                super().save_model(request, obj, form, change)
+                ratings.review_changed(*old, obj)
+            else:
+                super().save_model(request, obj, form, change)
+                ratings.review_added(obj)
+
+    def delete_model(self, request, obj):
+        with transaction.atomic():
+            super().delete_model(request, obj)
+            ratings.review_removed(obj)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            removed = list(queryset)
+            super().delete_queryset(request, queryset)
+            for review in removed:
+                ratings.review_removed(review)
+
+@admin.register(PriceHistory)
+class PriceHistoryAdmin(LargeTableAdmin):
+    list_display = ('event', 'old_price', 'new_price', 'changed_at')
+    list_filter = ('changed_at', EventListFilter)
+    list_select_related = ('event',)
+    raw_id_fields = ('event',)
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('kind', 'status', 'attempts', 'run_after', 'updated_at')
+    list_filter = ('status', 'kind')  # Add filters
+    search_fields = ('=batch',)
+    readonly_fields = ('last_error',)
+
 # Customize the admin site header and titles
 admin.site.site_header = "MusicEventOrg"
 admin.site.site_title = "MusicEventOrg"
@@ -72,11 +250,12 @@ class CustomAdminSite(AdminSite):
     def each_context(self, request):
         context = super().each_context(request)
         # Add custom context data
+        counts = counters.values()  # cached, no queries on most page loads
         context.update({
-            'total_events': Event.objects.count(),
-            'total_tickets_sold': Ticket.objects.filter(is_paid=True).count(),
-            'total_performers': Performer.objects.count(),
-            'total_festivals': Festival.objects.count(),
+            'total_events': counts['events'],
+            'total_tickets_sold': counts['tickets_sold'],
+            'total_performers': counts['performers'],
+            'total_festivals': counts['festivals'],
         })
         return context
 
@@ -90,5 +269,7 @@ custom_admin_site.register(Payment, PaymentAdmin)
 custom_admin_site.register(Performer, PerformerAdmin)
 custom_admin_site.register(Festival, FestivalAdmin)
 custom_admin_site.register(Review, ReviewAdmin)
+custom_admin_site.register(Job, JobAdmin)
+custom_admin_site.register(PriceHistory, PriceHistoryAdmin)
 custom_admin_site.register(Token)
 custom_admin_site.register(User, UserAdmin)
\ No newline at end of file
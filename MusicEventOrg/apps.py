@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MusicEventOrgConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'MusicEventOrg'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,196 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import counters
+from .models import Event, SeatMap, Ticket
+from .seatmap import SeatBitmap, SeatLayout, get_seat_map
+
+
+class SoldOut(Exception):
+    """Raised when an event has no seats left to sell."""
+
+
+class SeatUnavailable(Exception):
+    """Raised when the requested seat is already sold or not part of the event's layout."""
+
+
+def reserve_seats(event_id, quantity=1):
+    """
+    Take `quantity` seats off the event counter with a single conditional UPDATE.
+
+    The WHERE clause only matches while enough seats are left, so concurrent
+    bookings can never push the counter below zero. updated_at is bumped too
+    (update() skips auto_now) so cached copies of the event are invalidated.
+    """
+    updated = Event.objects.filter(pk=event_id, available_seats__gte=quantity).update(
+        available_seats=F('available_seats') - quantity, updated_at=timezone.now()
+    )
+    return updated == 1
+
+
+def claim_seats(event, seat_numbers):
+    """
+    Mark seats as taken in the event's seat map.
+
+    Runs inside the booking transaction; the seat map row is locked only
+    for the bit flips so the Event row itself is never locked. An event
+    without a seat map gets the default one built from total_seats first,
+    so seat numbers are always checked against a layout.
+    """
+    seat_map = SeatMap.objects.select_for_update().filter(event_id=event.pk).first()
+    if seat_map is None:
+        get_seat_map(event)
+        seat_map = SeatMap.objects.select_for_update().get(event_id=event.pk)
+    layout = SeatLayout(seat_map.layout)
+    bitmap = SeatBitmap(layout.size, seat_map.occupancy)
+    for seat_number in seat_numbers:
+        index = layout.index(seat_number)
+        if index is None or index in bitmap:
+            raise SeatUnavailable(f"Seat {seat_number} is not available for event {event.pk}")
+        bitmap.add(index)
+    seat_map.occupancy = bitmap.to_bytes()
+    seat_map.save(update_fields=['occupancy'])
+
+
+def hold_deadline():
+    return timezone.now() + timedelta(minutes=settings.TICKET_HOLD_MINUTES)
+
+
+def book_ticket(event, user=None, seat_number='', **extra):
+    """
+    Reserve one seat and insert its ticket in the same transaction.
+
+    Unpaid tickets are created as holds that expire after
+    TICKET_HOLD_MINUTES unless the payment completes first. The ticket
+    keeps the event's current price, which is what checkout charges.
+    """
+    if not extra.get('is_paid'):
+        extra.setdefault('hold_expires_at', hold_deadline())
+    extra.setdefault('price', event.price)
+    try:
+        with transaction.atomic():
+            if not reserve_seats(event.pk):
+                raise SoldOut(f"No seats available for event {event.pk}")
+            if seat_number:
+                claim_seats(event, [seat_number])
+            ticket = Ticket.objects.create(user=user, event=event, seat_number=seat_number, **extra)
+    except IntegrityError:
+        raise SeatUnavailable(f"Seat {seat_number} is already sold for event {event.pk}")
+    if event.available_seats:
+        event.available_seats -= 1  # keep the in-memory instance in step with the row
+    return ticket
+
+
+def book_tickets(event, user=None, seat_numbers=None, quantity=None, **extra):
+    """
+    Book several tickets for one event all-or-nothing.
+
+    Pass explicit `seat_numbers`, or just a `quantity` of unassigned
+    tickets. The seats come off the counter in one UPDATE and the tickets
+    go in with a single bulk_create.
+    """
+    seat_numbers = list(seat_numbers) if seat_numbers else [''] * quantity
+    assigned = [seat_number for seat_number in seat_numbers if seat_number]
+    if len(set(assigned)) != len(assigned):
+        raise SeatUnavailable(f"Duplicate seats requested for event {event.pk}")
+    if not extra.get('is_paid'):
+        extra.setdefault('hold_expires_at', hold_deadline())
+    extra.setdefault('price', event.price)
+    try:
+        with transaction.atomic():
+            if not reserve_seats(event.pk, len(seat_numbers)):
+                raise SoldOut(f"Not enough seats available for event {event.pk}")
+            if assigned:
+                claim_seats(event, assigned)
+            tickets = Ticket.objects.bulk_create([
+                Ticket(user=user, event=event, seat_number=seat_number, **extra) for seat_number in seat_numbers
+            ])
+            if extra.get('is_paid'):
+                counters.bump('tickets_sold', len(tickets))  # bulk_create sends no post_save
+    except IntegrityError:
+        raise SeatUnavailable(f"One of the requested seats is already sold for event {event.pk}")
+    if event.available_seats:
+        event.available_seats -= len(tickets)
+    return tickets
+
+
+def renew_hold(ticket):
+    """
+    Restart the hold clock of an unpaid ticket when a checkout begins or completes.
+
+    Call it inside a transaction with the ticket row locked (select_for_update)
+    so the sweeper can't release it meanwhile. A hold the sweeper already
+    released takes its seat back if the seat is still free. Returns False if
+    the seat has gone to someone else.
+    """
+    if ticket.released_at is None:
+        ticket.hold_expires_at = hold_deadline()
+        ticket.save(update_fields=['hold_expires_at'])
+        return True
+    try:
+        with transaction.atomic():
+            if not reserve_seats(ticket.event_id):
+                return False
+            if ticket.seat_number:
+                claim_seats(ticket.event, [ticket.seat_number])
+            deadline = hold_deadline()
+            # The seat uniqueness constraint covers the ticket again from here
+            Ticket.objects.filter(pk=ticket.pk).update(released_at=None, hold_expires_at=deadline)
+    except (IntegrityError, SeatUnavailable):
+        return False
+    ticket.released_at, ticket.hold_expires_at = None, deadline
+    return True
+
+
+def release_seat_bits(seats_by_event):
+    """Clear released seats from the seat maps of the affected events."""
+    for seat_map in SeatMap.objects.select_for_update().filter(event_id__in=seats_by_event):
+        layout = SeatLayout(seat_map.layout)
+        bitmap = SeatBitmap(layout.size, seat_map.occupancy)
+        for seat_number in seats_by_event[seat_map.event_id]:
+            index = layout.index(seat_number)
+            if index is not None:
+                bitmap.discard(index)
+        seat_map.occupancy = bitmap.to_bytes()
+        seat_map.save(update_fields=['occupancy'])
+
+
+def release_expired_holds(batch_size=500, now=None):
+    """
+    Release one batch of expired, unpaid holds and give their seats back.
+
+    The tickets are marked released rather than deleted, so a payment that
+    completes late can still find its ticket and renew_hold() it. Seats are
+    returned with one relative UPDATE per event, so the Event rows are never
+    selected for update. Returns the number of holds released; call
+    repeatedly until it returns 0.
+    """
+    now = now or timezone.now()
+    with transaction.atomic():
+        expired = list(
+            Ticket.objects.select_for_update(skip_locked=True)
+            .filter(is_paid=False, hold_expires_at__lt=now)
+            .values_list('id', 'event_id', 'seat_number')[:batch_size]
+        )
+        if not expired:
+            return 0
+        Ticket.objects.filter(id__in=[ticket_id for ticket_id, _, _ in expired]).update(
+            released_at=now, hold_expires_at=None
+        )
+
+        released = Counter(event_id for _, event_id, _ in expired)
+        for event_id, count in released.items():
+            Event.objects.filter(pk=event_id).update(available_seats=F('available_seats') + count, updated_at=now)
+
+        seats_by_event = defaultdict(list)
+        for _, event_id, seat_number in expired:
+            if seat_number:
+                seats_by_event[event_id].append(seat_number)
+        if seats_by_event:
+            release_seat_bits(seats_by_event)
+    return len(expired)
@@ -0,0 +1,76 @@
+from collections import Counter
+import time
+
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.utils import make_template_fragment_key
+
+# Cache alias used by the {% cache ... using="fragments" %} tags in the templates
+FRAGMENTS = 'fragments'
+
+# Fragment cache hits and misses seen by this process
+stats = Counter()
+
+_missing = object()
+
+
+class FragmentStatsMixin:
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if not key.startswith('template.cache.'):
+            return default if value is _missing else value  # generation keys aren't fragments
+        if value is _missing:
+            stats['misses'] += 1
+            return default
+        stats['hits'] += 1
+        return value
+
+
+class LocMemFragmentCache(FragmentStatsMixin, LocMemCache):
+    pass
+
+
+class FileBasedFragmentCache(FragmentStatsMixin, FileBasedCache):
+    pass
+
+
+def hit_rate():
+    lookups = stats['hits'] + stats['misses']
+    return {
+        'hits': stats['hits'],
+        'misses': stats['misses'],
+        'hit_rate': round(stats['hits'] / lookups, 3) if lookups else None,
+    }
+
+
+def invalidate(*fragments):
+    """Drop fragments given as (name, vary_on...) tuples."""
+    caches[FRAGMENTS].delete_many([make_template_fragment_key(name, vary_on) for name, *vary_on in fragments])
+
+
+def generation(name):
+    """
+    Token to vary fragments on when their keys can't be listed for deletion
+    (paged and searched lists). bump() replaces it, orphaning every fragment
+    rendered under the old one.
+    """
+    return caches[FRAGMENTS].get_or_set(f'generation:{name}', time.time_ns, None)
+
+
+def bump(name):
+    caches[FRAGMENTS].set(f'generation:{name}', time.time_ns(), None)
+
+
+def invalidate_events(event_ids):
+    """Drop everything rendered from these events: their cards, lineups and the home page sections."""
+    fragments = [('home_hero',), ('upcoming_events',)]
+    for event_id in event_ids:
+        fragments += [('event_card', event_id), ('event_performers', event_id)]
+    invalidate(*fragments)
+    bump('performers')  # upcoming event counts
+
+
+def invalidate_performers(event_ids=()):
+    invalidate(*[('event_performers', event_id) for event_id in event_ids])
+    bump('performers')
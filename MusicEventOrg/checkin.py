@@ -0,0 +1,162 @@
+import atexit
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Ticket
+from .ticket_tokens import InvalidToken, verify_ticket_token
+
+ADMITTED = 'admitted'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+WRONG_EVENT = 'wrong_event'
+
+logger = logging.getLogger(__name__)
+
+
+class EventAdmissions:
+    """
+    One bit per ticket of an event, set when the ticket is admitted.
+
+    Bits are indexed by ticket id relative to the event's lowest ticket id
+    and the bitmap grows as later tickets are scanned.
+    """
+
+    def __init__(self, base, admitted_ids=()):
+        self.base = base
+        self.bits = bytearray()
+        self.lock = threading.Lock()
+        for ticket_id in admitted_ids:
+            self.test_and_set(ticket_id)
+
+    def test_and_set(self, ticket_id):
+        """Mark the ticket admitted; returns False if it already was."""
+        offset = ticket_id - self.base
+        if offset < 0:
+            # Older than anything seen when the event was loaded: cannot be one of its tickets
+            return False
+        byte, mask = offset >> 3, 1 << (offset & 7)
+        with self.lock:
+            if byte >= len(self.bits):
+                self.bits.extend(bytes(byte + 1 - len(self.bits)))
+            if self.bits[byte] & mask:
+                return False
+            self.bits[byte] |= mask
+            return True
+
+
+class AdmissionRegistry:
+    """
+    In-memory check-in state for the events currently being scanned.
+
+    Scans are decided against the per-event bitmaps and the admissions are
+    written back to Ticket.admitted_at in batched UPDATEs, so gates never
+    wait on Ticket row locks. The bitmaps live in this process: route an
+    event's gates to the same worker process. The write-back only touches
+    tickets with no admitted_at yet, so the database stays correct either way.
+
+    A background thread writes the buffer back every CHECKIN_FLUSH_SECONDS
+    and whatever is left is flushed when the process exits, so admissions
+    don't wait for the next scan to reach the database.
+    """
+
+    def __init__(self):
+        self.events = {}
+        self.lock = threading.Lock()
+        self.pending = []
+        self.last_flush = time.monotonic()
+        self.writer = None
+        self.exit_flush_registered = False
+
+    def start_writer(self):
+        """Start the background writer in this process if it isn't running (e.g. after a fork)."""
+        if self.writer is not None and self.writer.is_alive():
+            return
+        with self.lock:
+            if self.writer is not None and self.writer.is_alive():
+                return
+            self.writer = threading.Thread(target=self.write_back, name='checkin-writer', daemon=True)
+            self.writer.start()
+            if not self.exit_flush_registered:
+                atexit.register(self.maybe_flush, force=True)
+                self.exit_flush_registered = True
+
+    def write_back(self):
+        while True:
+            time.sleep(settings.CHECKIN_FLUSH_SECONDS)
+            if self.pending:
+                self.maybe_flush(force=True)
+                close_old_connections()
+
+    def admissions(self, event_id):
+        admissions = self.events.get(event_id)
+        if admissions is None:
+            with self.lock:
+                admissions = self.events.get(event_id)
+                if admissions is None:
+                    tickets = Ticket.objects.filter(event_id=event_id)
+                    base = tickets.aggregate(base=Min('id'))['base'] or 0
+                    admitted = tickets.filter(admitted_at__isnull=False).values_list('id', flat=True)
+                    admissions = self.events[event_id] = EventAdmissions(base, admitted.iterator())
+        return admissions
+
+    def check_in(self, token, event_id=None):
+        """Validate a ticket token and admit it; returns a result dict for the gate."""
+        try:
+            claims = verify_ticket_token(token)
+        except InvalidToken as exc:
+            return {'status': INVALID, 'error': str(exc)}
+        result = {'ticket_id': claims.ticket_id, 'event_id': claims.event_id, 'seat_number': claims.seat_number}
+        if event_id is not None and claims.event_id != event_id:
+            return dict(result, status=WRONG_EVENT, error="Ticket is for a different event.")
+        if not self.admit(claims.event_id, claims.ticket_id):
+            return dict(result, status=DUPLICATE, error="Ticket has already been used.")
+        return dict(result, status=ADMITTED)
+
+    def admit(self, event_id, ticket_id):
+        """Record an admission for write-back; returns False if the ticket was already admitted."""
+        if not self.admissions(event_id).test_and_set(ticket_id):
+            return False
+        with self.lock:
+            self.pending.append(ticket_id)
+        self.start_writer()
+        self.maybe_flush()
+        return True
+
+    def maybe_flush(self, force=False):
+        """
+        Flush if the buffer is full or CHECKIN_FLUSH_SECONDS have passed, or always with `force`.
+
+        Never raises: the scans are already decided, so a failed write-back is
+        logged and the admissions stay buffered for the next attempt.
+        """
+        if not force and (len(self.pending) < settings.CHECKIN_FLUSH_SIZE
+                          and time.monotonic() - self.last_flush < settings.CHECKIN_FLUSH_SECONDS):
+            return 0
+        try:
+            return self.flush()
+        except Exception:
+            logger.exception("Writing back %d admissions failed, will retry", len(self.pending))
+            return 0
+
+    def flush(self):
+        """Write buffered admissions to the database in one UPDATE; raises if the write fails."""
+        with self.lock:
+            ticket_ids, self.pending = self.pending, []
+            self.last_flush = time.monotonic()
+        if ticket_ids:
+            try:
+                Ticket.objects.filter(id__in=ticket_ids, admitted_at__isnull=True).update(admitted_at=timezone.now())
+            except Exception:
+                with self.lock:
+                    self.pending.extend(ticket_ids)  # retry with the next flush
+                raise
+        return len(ticket_ids)
+
+
+registry = AdmissionRegistry()
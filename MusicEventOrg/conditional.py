@@ -0,0 +1,48 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+class ConditionalGetMixin:
+    """
+    ETag / Last-Modified validators for retrieve and list on models with `updated_at`.
+
+    The validators come from one small query (the row's updated_at, or
+    MAX(updated_at) and COUNT(*) over the filtered list), so an unchanged
+    resource is answered with 304 before anything is loaded or serialized.
+    Lists only get an ETag: a deletion doesn't move MAX(updated_at), so
+    Last-Modified alone could wrongly report them unchanged.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        updated_at = (self.filter_queryset(self.get_queryset())
+                      .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                      .values_list('updated_at', flat=True).first())
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)
+        return self.conditional_response(super().retrieve, (updated_at,), updated_at, request, *args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        stats = self.filter_queryset(self.get_queryset()).order_by().aggregate(
+            last_modified=Max('updated_at'), count=Count('pk')
+        )
+        fingerprint = (stats['last_modified'], stats['count'])
+        return self.conditional_response(super().list, fingerprint, None, request, *args, **kwargs)
+
+    def conditional_response(self, render, fingerprint, last_modified, request, *args, **kwargs):
+        etag = quote_etag(make_etag(request.get_full_path(), request.accepted_renderer.format, *fingerprint))
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+        if response is None:
+            response = render(request, *args, **kwargs)
+        response['ETag'] = etag
+        if timestamp is not None:
+            response['Last-Modified'] = http_date(timestamp)
+        return response
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from .models import Event, Festival, Performer, SiteCounter, Ticket
+
+CACHE_KEY = 'site-counters'
+
+# Counter name -> the query it stands in for
+COUNTS = {
+    'events': lambda: Event.objects.count(),
+    'tickets_sold': lambda: Ticket.objects.filter(is_paid=True).count(),
+    'performers': lambda: Performer.objects.count(),
+    'festivals': lambda: Festival.objects.count(),
+}
+
+
+def values():
+    """All counters, from the cache when possible (no queries) or one small table read."""
+    counts = cache.get(CACHE_KEY)
+    if counts is None:
+        counts = dict(SiteCounter.objects.values_list('name', 'value'))
+        if set(COUNTS) - set(counts):
+            counts = reconcile(set(COUNTS) - set(counts)) | counts
+        cache.set(CACHE_KEY, counts, settings.SITE_COUNTERS_CACHE_SECONDS)
+    return counts
+
+
+def bump(name, delta=1):
+    """
+    Adjust a counter once the current transaction commits.
+
+    Deferring the UPDATE keeps the counter row from being locked for the
+    length of every booking transaction; a crash in between only leaves a
+    drift that reconcile() repairs.
+    """
+    if delta:
+        transaction.on_commit(lambda: _apply(name, delta))
+
+
+def _apply(name, delta):
+    if not SiteCounter.objects.filter(name=name).update(value=F('value') + delta):
+        reconcile([name])
+    cache.delete(CACHE_KEY)
+
+
+def reconcile(names=None):
+    """Recount from the source tables and return the {name: value} written."""
+    counts = {name: COUNTS[name]() for name in (names or COUNTS)}
+    for name, value in counts.items():
+        SiteCounter.objects.update_or_create(name=name, defaults={'value': value})
+    cache.delete(CACHE_KEY)
+    return counts
@@ -0,0 +1,119 @@
+import csv
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from rest_framework.exceptions import ValidationError
+
+from .models import Payment, Ticket
+
+# Export -> (model, [(column header, values_list lookup), ...], path from the model to its ticket)
+EXPORTS = {
+    'tickets': (Ticket, [
+        ('ticket_id', 'id'),
+        ('event_id', 'event_id'),
+        ('event', 'event__title'),
+        ('event_date', 'event__date'),
+        ('venue', 'event__venue__name'),
+        ('festival', 'event__festival__title'),
+        ('username', 'user__username'),
+        ('email', 'user__email'),
+        ('seat_number', 'seat_number'),
+        ('is_paid', 'is_paid'),
+        ('admitted_at', 'admitted_at'),
+        ('payment_method', 'payment__payment_method'),
+        ('amount', 'payment__amount'),
+        ('paid_at', 'payment__timestamp'),
+    ], ''),
+    'attendees': (Ticket, [
+        ('ticket_id', 'id'),
+        ('first_name', 'user__first_name'),
+        ('last_name', 'user__last_name'),
+        ('username', 'user__username'),
+        ('email', 'user__email'),
+        ('event', 'event__title'),
+        ('event_date', 'event__date'),
+        ('venue', 'event__venue__name'),
+        ('seat_number', 'seat_number'),
+        ('admitted_at', 'admitted_at'),
+    ], ''),
+    'payments': (Payment, [
+        ('payment_id', 'id'),
+        ('transaction_id', 'transaction_id'),
+        ('payment_method', 'payment_method'),
+        ('amount', 'amount'),
+        ('paid_at', 'timestamp'),
+        ('ticket_id', 'ticket_id'),
+        ('event_id', 'ticket__event_id'),
+        ('event', 'ticket__event__title'),
+        ('venue', 'ticket__event__venue__name'),
+        ('festival', 'ticket__event__festival__title'),
+        ('username', 'ticket__user__username'),
+        ('email', 'ticket__user__email'),
+        ('seat_number', 'ticket__seat_number'),
+    ], 'ticket__'),
+}
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+
+def queryset_for(export):
+    queryset = EXPORTS[export][0].objects.all()
+    if export == 'attendees':
+        queryset = queryset.filter(is_paid=True)
+    return queryset
+
+
+def apply_filters(queryset, export, params):
+    """
+    Narrow an export by ?event=, ?festival=, ?payment_method= and ?date_from=/?date_to=
+    (YYYY-MM-DD, inclusive): payment dates for payments, event dates otherwise.
+    """
+    ticket = EXPORTS[export][2]
+    filters = {}
+    for name, lookup in (('event', f'{ticket}event_id'), ('festival', f'{ticket}event__festival_id')):
+        if params.get(name):
+            if not params[name].isdigit():
+                raise ValidationError({name: 'Must be an id.'})
+            filters[lookup] = int(params[name])
+    if params.get('payment_method'):
+        filters['payment_method' if export == 'payments' else 'payment__payment_method'] = params['payment_method']
+    date_field = 'timestamp' if export == 'payments' else 'event__date'
+    for name, lookup in (('date_from', 'gte'), ('date_to', 'lte')):
+        if params.get(name):
+            day = parse_date(params[name]) if len(params[name]) == 10 else None
+            if day is None:
+                raise ValidationError({name: 'Use YYYY-MM-DD.'})
+            filters[f'{date_field}__date__{lookup}'] = day
+    return queryset.filter(**filters)
+
+
+class Echo:
+    """File-like object whose write() hands the line back, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def stream_rows(queryset, export, fmt):
+    headers, lookups = zip(*EXPORTS[export][1])
+    # values_list joins user/event/venue in the one query; iterator() reads it through a
+    # server-side cursor where the database has them, so only a chunk is ever in memory
+    rows = queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    if fmt == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(headers)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        for row in rows:
+            yield json.dumps(dict(zip(headers, row)), cls=DjangoJSONEncoder) + '\n'
+
+
+def export_response(queryset, export, fmt='csv'):
+    filename = f"{export}-{timezone.localdate():%Y%m%d}.{fmt}"
+    response = StreamingHttpResponse(stream_rows(queryset, export, fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
@@ -0,0 +1,54 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields=a,b and ?omit=c for viewsets whose serializer uses SparseFieldsMixin.
+
+    On reads the serializer renders only the chosen fields, the queryset is
+    restricted with .only() to the columns those fields, the ordering and any
+    select_related joins need, and unused prefetches are dropped.
+    """
+
+    def requested_fields(self):
+        if self.request is None or self.request.method not in SAFE_METHODS:
+            return None, None
+        params = self.request.query_params
+        fields = [name for name in params.get('fields', '').split(',') if name]
+        omit = [name for name in params.get('omit', '').split(',') if name]
+        return fields or None, omit or None
+
+    def get_serializer(self, *args, **kwargs):
+        fields, omit = self.requested_fields()
+        if fields or omit:
+            kwargs.setdefault('fields', fields)
+            kwargs.setdefault('omit', omit)
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if not any(self.requested_fields()):
+            return queryset
+        names = self.get_serializer().model_field_names()
+        if names is None:
+            return queryset
+        # Skip prefetches for relations that aren't rendered
+        prefetches = [lookup for lookup in queryset._prefetch_related_lookups
+                      if getattr(lookup, 'prefetch_through', lookup).split('__')[0] in names]
+        queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+        # The paginator reads the ordering field and joined rows need their foreign key loaded
+        ordering = list(queryset.query.order_by) + list(getattr(self, 'ordering', None) or [])
+        names.update(name.lstrip('-') for name in ordering)
+        if isinstance(queryset.query.select_related, dict):
+            names.update(queryset.query.select_related)
+        opts = queryset.model._meta
+        columns = []
+        for name in names:
+            try:
+                field = opts.get_field(name)
+            except FieldDoesNotExist:
+                continue  # annotations such as search_rank, or 'pk'
+            if field.concrete and not field.many_to_many:
+                columns.append(name)
+        return queryset.only(*columns)
@@ -0,0 +1,104 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+import numpy as np
+
+from .models import Event, EventForecast, SalesRollup
+
+MAX_HORIZON_DAYS = 366  # sales further out than this are not projected
+
+
+def load_sales(history_days, extra_fields=()):
+    """
+    Upcoming events and their recent daily sales as arrays, in two queries.
+
+    Returns (event ids, seats left, seats taken, days until the show,
+    on-sale mask, sales, {extra field: values}) where the mask and sales
+    are events x history_days matrices ending today.
+    """
+    now = timezone.now()
+    today = timezone.localdate(now)
+    start = today - timedelta(days=history_days - 1)
+    events = list(Event.objects.filter(date__gt=now).order_by('pk')
+                  .values_list('pk', 'total_seats', 'available_seats', 'date', 'created_at', *extra_fields))
+    if not events:
+        return None
+    ids, total, available, dates, created, *extras = zip(*events)
+    ids = np.array(ids)
+    days_to_show = np.array([(timezone.localdate(date) - today).days for date in dates])
+    on_sale_from = np.array([(timezone.localdate(date) - start).days for date in created])
+
+    sales = np.zeros((len(ids), history_days))
+    rows = list(SalesRollup.objects.filter(event__date__gt=now, day__gte=start, day__lte=today)
+                .values('event_id', 'day').annotate(tickets=Sum('tickets')).order_by()
+                .values_list('event_id', 'day', 'tickets'))
+    if rows:
+        event_ids, days, tickets = zip(*rows)
+        day_index = (np.array(days, dtype='datetime64[D]') - np.datetime64(start)).astype(int)
+        np.add.at(sales, (np.searchsorted(ids, event_ids), day_index), tickets)
+    # On sale from its creation, or its first recorded sale if that is earlier (imported events)
+    first_sale = np.where(sales.any(axis=1), (sales > 0).argmax(axis=1), history_days)
+    on_sale_from = np.minimum(on_sale_from, first_sale)
+    on_sale = np.arange(history_days)[None, :] >= on_sale_from[:, None]
+    available = np.array(available)
+    taken = np.array(total) - available
+    return ids, available, taken, days_to_show, on_sale, sales, dict(zip(extra_fields, extras))
+
+
+def fit(available, taken, days_to_show, on_sale, sales):
+    """
+    Fit a linear trend to every event's daily sales at once and project it to the show.
+
+    Each row is a weighted least-squares line through the days the event was
+    on sale. The trend is extrapolated for at most the length of the history,
+    then held, and never below zero. Returns (tickets per day today,
+    days until sell-out or -1, projected attendance).
+    """
+    history_days = sales.shape[1]
+    x = np.arange(history_days, dtype=float)
+    weight = on_sale.astype(float)
+    days_on_sale = weight.sum(axis=1)
+    safe = np.maximum(days_on_sale, 1)
+    x_mean = (weight * x).sum(axis=1) / safe
+    y_mean = (weight * sales).sum(axis=1) / safe
+    dx = x[None, :] - x_mean[:, None]
+    sxx = (weight * dx ** 2).sum(axis=1)
+    sxy = (weight * dx * (sales - y_mean[:, None])).sum(axis=1)
+    slope = np.divide(sxy, sxx, out=np.zeros_like(sxy), where=(sxx > 0) & (days_on_sale >= 3))
+    rate = np.maximum(y_mean + slope * (history_days - 1 - x_mean), 0)
+
+    horizon = min(max(int(days_to_show.max()), 1), MAX_HORIZON_DAYS)
+    t = np.arange(1, horizon + 1)
+    projected = np.maximum(rate[:, None] + slope[:, None] * np.minimum(t, history_days)[None, :], 0)
+    projected[t[None, :] > days_to_show[:, None]] = 0  # no sales after the show
+    cumulative = np.cumsum(projected, axis=1)
+
+    reaches = cumulative >= available[:, None]
+    sells_out = reaches.any(axis=1)
+    days_to_sellout = np.where(available == 0, 0, np.where(sells_out, reaches.argmax(axis=1) + 1, -1))
+    attendance = taken + np.minimum(np.rint(cumulative[:, -1]), available)
+    return rate, days_to_sellout, attendance.astype(int)
+
+
+def update_forecasts(history_days=None):
+    """Recompute EventForecast for every upcoming event; returns how many were written."""
+    loaded = load_sales(history_days or settings.FORECAST_HISTORY_DAYS)
+    if loaded is None:
+        return 0
+    ids, available, taken, days_to_show, on_sale, sales, _ = loaded
+    rate, days_to_sellout, attendance = fit(available, taken, days_to_show, on_sale, sales)
+    now = timezone.now()
+    today = timezone.localdate(now)
+    forecasts = [
+        EventForecast(event_id=int(event_id), daily_rate=float(event_rate), projected_attendance=int(seats),
+                      projected_sellout_date=today + timedelta(days=int(days)) if days >= 0 else None,
+                      computed_at=now)
+        for event_id, event_rate, days, seats in zip(ids, rate, days_to_sellout, attendance)
+    ]
+    EventForecast.objects.bulk_create(
+        forecasts, batch_size=1000, update_conflicts=True, unique_fields=['event'],
+        update_fields=['daily_rate', 'projected_sellout_date', 'projected_attendance', 'computed_at'],
+    )
+    return len(forecasts)
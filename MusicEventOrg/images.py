@@ -0,0 +1,88 @@
+from io import BytesIO
+import os
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from . import caching
+from .models import Event, Performer
+
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG'}
+MODELS = {'event': Event, 'performer': Performer}
+
+
+def derivative_name(name, width, fmt):
+    """events/show.png -> events/show-640w.webp, stored next to the original."""
+    root, _ = os.path.splitext(name)
+    return f"{root}-{width}w.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def build_derivatives(name, storage=default_storage):
+    """
+    Write the WebP and JPEG variants of an uploaded image and return their widths.
+
+    Only widths narrower than the original are produced, plus the original
+    width itself when it is smaller than every configured width.
+    """
+    with storage.open(name) as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image = image.convert('RGBA' if image.has_transparency_data else 'RGB')
+    widths = [width for width in settings.IMAGE_DERIVATIVE_WIDTHS if width < image.width] or [image.width]
+    for width in widths:
+        resized = image.resize((width, round(image.height * width / image.width)), Image.Resampling.LANCZOS)
+        for fmt, pil_format in FORMATS.items():
+            frame = resized if fmt == 'webp' else resized.convert('RGB')
+            buffer = BytesIO()
+            frame.save(buffer, pil_format, quality=settings.IMAGE_DERIVATIVE_QUALITY, optimize=True)
+            target = derivative_name(name, width, fmt)
+            storage.delete(target)  # storage.save() would pick a new name instead of overwriting
+            storage.save(target, ContentFile(buffer.getvalue()))
+    return widths
+
+
+def delete_derivatives(variants, storage=default_storage):
+    for width in variants.get('widths', []):
+        for fmt in FORMATS:
+            storage.delete(derivative_name(variants['source'], width, fmt))
+
+
+def record_derivatives(model, pk, name, widths):
+    """Store the widths built for `name`, unless the image was replaced meanwhile."""
+    model_class = MODELS[model]
+    fields = {'image_variants': {'source': name, 'widths': widths}}
+    if model == 'event':
+        fields['updated_at'] = timezone.now()
+    if not model_class.objects.filter(pk=pk, image=name).update(**fields):
+        return False
+    # update() sends no signals: drop the cached fragments that show this image ourselves
+    if model == 'event':
+        caching.invalidate_events([pk])
+    else:
+        caching.invalidate_performers(Event.objects.filter(performers=pk).values_list('pk', flat=True))
+    return True
+
+
+def build_for_instance(model, pk):
+    """Job handler: build the variants of an event's or performer's current image."""
+    instance = MODELS[model].objects.only('image', 'image_variants').get(pk=pk)
+    if not instance.image:
+        return
+    previous = instance.image_variants
+    widths = build_derivatives(instance.image.name)
+    if record_derivatives(model, pk, instance.image.name, widths) and previous.get('source') not in (None, instance.image.name):
+        delete_derivatives(previous)
+
+
+def srcset(instance, fmt, request=None):
+    """srcset attribute value for the instance's image, or '' until its variants are built."""
+    variants = instance.image_variants or {}
+    if not instance.image or variants.get('source') != instance.image.name:
+        return ''
+    candidates = []
+    for width in variants['widths']:
+        url = default_storage.url(derivative_name(instance.image.name, width, fmt))
+        candidates.append(f"{request.build_absolute_uri(url) if request else url} {width}w")
+    return ', '.join(candidates)
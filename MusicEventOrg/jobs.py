@@ -0,0 +1,109 @@
+from datetime import timedelta
+import logging
+import traceback
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> dotted path of the function that runs it. The payload is passed as keyword arguments.
+HANDLERS = {
+    'generate_qr_code': 'MusicEventOrg.utils.generate_qr_code',
+    'reindex_related': 'MusicEventOrg.search.reindex_related',
+    'build_image_derivatives': 'MusicEventOrg.images.build_for_instance',
+}
+
+
+def enqueue(kind, **payload):
+    """
+    Queue a background job.
+
+    The job row is written in the caller's transaction, so it only becomes
+    visible to workers once the booking or payment that created it commits.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.create(kind=kind, payload=payload)
+
+
+def enqueue_many(kind, payloads, batch=''):
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    return Job.objects.bulk_create([Job(kind=kind, payload=payload, batch=batch) for payload in payloads],
+                                   batch_size=1000)
+
+
+def progress(batch):
+    """{status: job count} for the jobs queued under `batch`."""
+    counts = dict.fromkeys((Job.PENDING, Job.RUNNING, Job.DONE, Job.FAILED), 0)
+    counts.update(Job.objects.filter(batch=batch).values_list('status').annotate(Count('pk')).order_by())
+    return counts
+
+
+def claim(batch_size=10):
+    """
+    Mark up to `batch_size` due jobs as running and return them.
+
+    Claimed jobs are leased for JOB_LEASE_SECONDS through run_after. If the
+    worker crashes or is terminated before run() records the outcome, the
+    lease runs out and the job is claimed again, or failed once it has used
+    up JOB_MAX_ATTEMPTS.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status__in=[Job.PENDING, Job.RUNNING], run_after__lte=now)
+            .order_by('run_after')
+            .values_list('id', 'status', 'attempts')[:batch_size]
+        )
+        abandoned = [job_id for job_id, status, attempts in rows
+                     if status == Job.RUNNING and attempts >= settings.JOB_MAX_ATTEMPTS]
+        if abandoned:
+            Job.objects.filter(id__in=abandoned).update(
+                status=Job.FAILED, last_error='Worker stopped before the job finished', updated_at=now
+            )
+        ids = [job_id for job_id, _, _ in rows if job_id not in abandoned]
+        if not ids:
+            return []
+        Job.objects.filter(id__in=ids).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, updated_at=now,
+            run_after=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+        )
+    return list(Job.objects.filter(id__in=ids, status=Job.RUNNING))
+
+
+def run(job):
+    try:
+        import_string(HANDLERS[job.kind])(**job.payload)
+    except ObjectDoesNotExist as exc:
+        # The ticket (or whatever the job was for) is gone, retrying won't help
+        job.status, job.last_error = Job.FAILED, str(exc)
+    except Exception:
+        logger.exception(f"Job {job.id} ({job.kind}) failed")
+        job.last_error = traceback.format_exc()
+        if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+            job.status = Job.FAILED
+        else:
+            # Exponential backoff: 2, 4, 8, ... seconds
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=2 ** job.attempts)
+    else:
+        job.status = Job.DONE
+    job.save(update_fields=['status', 'last_error', 'run_after', 'updated_at'])
+    return job
+
+
+def work(batch_size=10):
+    """Claim and run one batch of jobs; returns how many ran."""
+    jobs = claim(batch_size)
+    for job in jobs:
+        run(job)
+    return len(jobs)
@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the daily sales rollups behind the sales charts from the Payment table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat,
+                            help='Only rebuild days from this date (YYYY-MM-DD) on; all days by default')
+
+    def handle(self, *args, **options):
+        rows = rebuild(options['since'])
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rows} sales rollup rows.'))
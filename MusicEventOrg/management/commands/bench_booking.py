@@ -0,0 +1,98 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, DatabaseError
+from django.utils import timezone
+
+from MusicEventOrg.booking import SoldOut, book_ticket
+from MusicEventOrg.models import Venue, Event, Ticket
+
+
+def legacy_book(event_id):
+    # The old read-modify-write path from TicketViewSet.create
+    event = Event.objects.get(pk=event_id)
+    if event.available_seats <= 0:
+        raise SoldOut(event_id)
+    Ticket.objects.create(event=event, seat_number='')
+    event.available_seats -= 1
+    event.save()
+
+
+def atomic_book(event_id):
+    book_ticket(Event(pk=event_id))
+
+
+class Command(BaseCommand):
+    help = 'Fires concurrent bookings at one event and compares the legacy and atomic booking paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookings', type=int, default=500, help='Number of booking attempts')
+        parser.add_argument('--seats', type=int, default=400, help='Seats on the benchmark event')
+        parser.add_argument('--concurrency', type=int, default=200, help='Parallel booking threads')
+        parser.add_argument('--min-speedup', type=float, default=1.0,
+                            help='Fail unless the atomic path books at least this many times faster than legacy')
+
+    def handle(self, *args, **options):
+        bookings, seats = options['bookings'], options['seats']
+        venue = Venue.objects.create(name='Benchmark Hall', address='Benchmark')
+        try:
+            results = {}
+            for name, book in (('legacy', legacy_book), ('atomic', atomic_book)):
+                results[name] = self.run(book, venue, bookings, seats, options['concurrency'])
+                self.report(name, seats, results[name])
+        finally:
+            venue.delete()
+
+        legacy, atomic = results['legacy'], results['atomic']
+        if atomic['final_seats'] != seats - atomic['tickets'] or atomic['tickets'] != atomic['booked']:
+            raise CommandError('Atomic path lost track of the seat count.')
+        if atomic['booked'] + atomic['errors'] < min(bookings, seats):
+            raise CommandError('Atomic path turned bookings away while seats were left.')
+        speedup = atomic['throughput'] / legacy['throughput'] if legacy['throughput'] else float('inf')
+        if speedup < options['min_speedup']:
+            raise CommandError(f"Atomic path throughput is {speedup:.2f}x legacy, "
+                               f"expected at least {options['min_speedup']:.2f}x.")
+        self.stdout.write(self.style.SUCCESS(f'Atomic path throughput: {speedup:.2f}x legacy, seat count exact.'))
+
+    def run(self, book, venue, bookings, seats, concurrency):
+        event = Event.objects.create(
+            title='Booking benchmark', description='', date=timezone.now() + timedelta(days=1),
+            venue=venue, price=0, total_seats=seats, available_seats=seats,
+        )
+        outcome = {'booked': 0, 'sold_out': 0, 'errors': 0}
+
+        def attempt(_):
+            try:
+                book(event.pk)
+                return 'booked'
+            except SoldOut:
+                return 'sold_out'
+            except DatabaseError:
+                return 'errors'
+            finally:
+                connection.close()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for result in pool.map(attempt, range(bookings)):
+                outcome[result] += 1
+        elapsed = time.perf_counter() - start
+
+        event.refresh_from_db()
+        outcome.update(
+            elapsed=elapsed,
+            throughput=outcome['booked'] / elapsed,
+            tickets=Ticket.objects.filter(event=event).count(),
+            final_seats=event.available_seats,
+        )
+        return outcome
+
+    def report(self, name, seats, result):
+        oversold = result['tickets'] - (seats - result['final_seats'])
+        self.stdout.write(
+            f"{name:>7}: {result['booked']} booked, {result['sold_out']} sold out, {result['errors']} errors "
+            f"in {result['elapsed']:.2f}s ({result['throughput']:.0f} bookings/s); "
+            f"tickets={result['tickets']} seats_left={result['final_seats']} oversold={oversold}"
+        )
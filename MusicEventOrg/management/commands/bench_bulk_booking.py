@@ -0,0 +1,61 @@
+from datetime import timedelta
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from MusicEventOrg.models import Venue, Event, Ticket
+
+
+class Command(BaseCommand):
+    help = 'Compares booking a group with N single ticket requests against one bulk request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickets', type=int, default=50, help='Group size')
+
+    def handle(self, *args, **options):
+        count = options['tickets']
+        admin = User.objects.create_superuser(f'bench-{time.time_ns()}', password=None)
+        venue = Venue.objects.create(name='Benchmark Hall', address='Benchmark')
+        client = APIClient()
+        client.force_authenticate(admin)
+        try:
+            event = self.make_event(venue, count)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(count):
+                    client.post('/api/tickets/', {'event': event.pk}, format='json')
+                single = time.perf_counter() - start
+            self.report(f'{count} single requests', single, len(queries), event)
+
+            event = self.make_event(venue, count)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                client.post('/api/tickets/bulk/', {'event': event.pk, 'quantity': count}, format='json')
+                bulk = time.perf_counter() - start
+            self.report('1 bulk request', bulk, len(queries), event)
+
+            self.stdout.write(self.style.SUCCESS(f'Bulk booking is {single / bulk:.1f}x faster.'))
+        finally:
+            for ticket in Ticket.objects.filter(event__venue=venue).exclude(qr_code=''):
+                ticket.qr_code.delete(save=False)
+            venue.delete()
+            admin.delete()
+
+    def make_event(self, venue, seats):
+        return Event.objects.create(
+            title='Bulk booking benchmark', description='', date=timezone.now() + timedelta(days=1),
+            venue=venue, price=0, total_seats=seats, available_seats=seats,
+        )
+
+    def report(self, label, elapsed, queries, event):
+        event.refresh_from_db()
+        booked = Ticket.objects.filter(event=event).count()
+        self.stdout.write(
+            f'{label}: {booked} tickets in {elapsed * 1000:.0f}ms, {queries} queries, '
+            f'{event.available_seats} seats left'
+        )
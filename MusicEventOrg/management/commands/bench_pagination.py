@@ -0,0 +1,57 @@
+from datetime import timedelta
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from MusicEventOrg.models import Venue, Event, Ticket
+from MusicEventOrg.pagination import KeysetPagination
+
+
+class Command(BaseCommand):
+    help = 'Compares page-number and keyset pagination of the ticket list, on the first and a deep page'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=10000, help='Deep page to fetch')
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        page, size = options['page'], options['page_size']
+        rows = page * size
+        venue = Venue.objects.create(name='Benchmark Hall', address='Benchmark')
+        try:
+            event = Event.objects.create(
+                title='Pagination benchmark', description='', date=timezone.now() + timedelta(days=1),
+                venue=venue, price=0, total_seats=rows, available_seats=0,
+            )
+            Ticket.objects.bulk_create((Ticket(event=event) for _ in range(rows)), batch_size=5000)
+            queryset = Ticket.objects.filter(event=event).order_by('-pk')
+            # Cursor pointing just before the deep page, as a client walking the list would hold
+            last = queryset.values_list('pk', flat=True)[(page - 1) * size - 1]
+            cursor = KeysetPagination().encode_cursor({'v': None, 'id': last}, 'n')
+
+            numbered = PageNumberPagination()
+            numbered.page_size = size
+            for label, paginator, params in [
+                ('page-number, page 1', numbered, {}),
+                (f'page-number, page {page}', numbered, {'page': page}),
+                ('keyset, page 1', KeysetPagination(), {'limit': size}),
+                (f'keyset, page {page}', KeysetPagination(), {'limit': size, 'cursor': cursor}),
+            ]:
+                request = Request(APIRequestFactory().get('/api/tickets/', params))
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for _ in range(options['repeat']):
+                        paginator.paginate_queryset(queryset, request)
+                    elapsed = (time.perf_counter() - start) / options['repeat']
+                self.stdout.write(
+                    f'{label}: {elapsed * 1000:.2f}ms, {len(queries) // options["repeat"]} queries per page'
+                )
+        finally:
+            venue.delete()
@@ -0,0 +1,47 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+import os
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from MusicEventOrg.images import MODELS, build_derivatives, delete_derivatives, record_derivatives
+
+
+class Command(BaseCommand):
+    help = 'Builds the resized WebP/JPEG copies of existing event and performer images in a process pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count(), help='Number of worker processes')
+        parser.add_argument('--force', action='store_true', help='Rebuild images that already have their copies')
+
+    def handle(self, *args, **options):
+        pending = []
+        for model, model_class in MODELS.items():
+            for pk, name, variants in model_class.objects.exclude(image='').exclude(image=None).values_list(
+                    'pk', 'image', 'image_variants'):
+                if options['force'] or variants.get('source') != name:
+                    pending.append((model, pk, name, variants))
+        if not pending:
+            self.stdout.write('All images are up to date.')
+            return
+
+        # Resizing is CPU bound: the pool only touches files, the database is updated from here.
+        # Workers are forked so they inherit the configured storage settings.
+        connections.close_all()
+        built = failed = 0
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=options['processes'], mp_context=context) as pool:
+            futures = {pool.submit(build_derivatives, item[2]): item for item in pending}
+            for future in as_completed(futures):
+                model, pk, name, previous = futures[future]
+                try:
+                    widths = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{name}: {exc}')
+                    continue
+                if record_derivatives(model, pk, name, widths) and previous.get('source') not in (None, name):
+                    delete_derivatives(previous)
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f'Built copies of {built} images, {failed} failed.'))
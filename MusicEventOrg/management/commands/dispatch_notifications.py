@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.notifications import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Sends queued SMS and email notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Notifications sent per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep dispatching instead of exiting')
+        parser.add_argument('--interval', type=int, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                sent = dispatch(batch_size=options['batch_size'])
+                if not sent:
+                    break
+                total += sent
+            if total or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Dispatched {total} notifications.'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
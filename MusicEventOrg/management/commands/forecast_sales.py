@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.forecast import update_forecasts
+
+
+class Command(BaseCommand):
+    help = 'Projects the sell-out date and final attendance of every upcoming event from its daily sales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--history-days', type=int, help='Days of sales to fit (default FORECAST_HISTORY_DAYS)')
+        parser.add_argument('--loop', action='store_true', help='Keep forecasting instead of exiting')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            count = update_forecasts(options['history_days'])
+            self.stdout.write(self.style.SUCCESS(
+                f'Forecast {count} events in {time.perf_counter() - started:.2f}s.'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -1,6 +1,6 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
-from MusicEventOrg.models import Venue, Event, Performer, Festival
+from MusicEventOrg.models import Venue, Event, Performer, Festival, SeatMap
 from datetime import datetime, timedelta
 from django.utils import timezone
 import random
@@ -86,6 +86,10 @@ class Command(BaseCommand):
                 festival=festival
             )
             event.performers.add(*random.sample(performers, k=3))
+            # Stadium seating: four stands of 50 rows x 25 seats
+            SeatMap.objects.create(event=event, layout=[
+                {'name': stand, 'seats': 1250, 'seats_per_row': 25} for stand in ('North', 'South', 'East', 'West')
+            ])
 
         self.stdout.write('Events created.')
         self.stdout.write(self.style.SUCCESS('Successfully populated database with sample data.'))
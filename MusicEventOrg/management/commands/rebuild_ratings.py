@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.ratings import rebuild_aggregates
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the rating aggregates stored on every event from the reviews table'
+
+    def handle(self, *args, **kwargs):
+        updated = rebuild_aggregates()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt rating aggregates for {updated} reviewed events.'))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.models import Event
+from MusicEventOrg.search import index_events
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the event search index (tsvector documents on PostgreSQL, inverted index elsewhere)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500, help='Events indexed per transaction')
+
+    def handle(self, *args, **options):
+        event_ids = list(Event.objects.values_list('pk', flat=True))
+        chunk_size = options['chunk_size']
+        for start in range(0, len(event_ids), chunk_size):
+            index_events(event_ids[start:start + chunk_size])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {len(event_ids)} events.'))
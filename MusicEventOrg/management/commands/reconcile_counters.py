@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg import counters
+from MusicEventOrg.models import SiteCounter
+
+
+class Command(BaseCommand):
+    help = 'Recounts the admin dashboard counters from the source tables and repairs any drift'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep reconciling instead of exiting')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            stored = dict(SiteCounter.objects.values_list('name', 'value'))
+            for name, value in counters.reconcile().items():
+                if stored.get(name) != value:
+                    self.stdout.write(self.style.WARNING(f'{name}: {stored.get(name)} -> {value}'))
+            if not options['loop']:
+                self.stdout.write(self.style.SUCCESS('Counters reconciled.'))
+                return
+            time.sleep(options['interval'])
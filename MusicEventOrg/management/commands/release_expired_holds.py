@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.booking import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Releases seats held by unpaid tickets whose hold has expired'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Holds released per transaction')
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping instead of exiting')
+        parser.add_argument('--interval', type=int, default=30, help='Seconds between sweeps with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            total = 0
+            while True:
+                released = release_expired_holds(batch_size=options['batch_size'])
+                if not released:
+                    break
+                total += released
+            if total or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(f'Released {total} expired holds.'))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
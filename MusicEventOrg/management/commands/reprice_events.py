@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from MusicEventOrg.pricing import reprice_events
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the price of every upcoming event from its recent demand, within its floor and ceiling'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print the new prices without saving them')
+        parser.add_argument('--loop', action='store_true', help='Keep repricing instead of exiting')
+        parser.add_argument('--interval', type=int, default=3600, help='Seconds between runs with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            changes = reprice_events(dry_run=options['dry_run'])
+            for event_id, old, new in changes:
+                self.stdout.write(f'Event {event_id}: {old} -> {new}')
+            self.stdout.write(self.style.SUCCESS(
+                f"{'Would reprice' if options['dry_run'] else 'Repriced'} {len(changes)} events."))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,63 @@
+import logging
+import multiprocessing
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections
+
+from MusicEventOrg import jobs
+
+
+logger = logging.getLogger(__name__)
+
+
+def worker_loop(batch_size, poll_interval, once):
+    while True:
+        try:
+            ran = jobs.work(batch_size)
+        except OperationalError:
+            # Lost connection or lock timeout: reconnect and try again
+            logger.exception("Worker could not reach the job queue")
+            connections.close_all()
+            time.sleep(poll_interval)
+            continue
+        if not ran:
+            if once:
+                break
+            time.sleep(poll_interval)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs (QR codes, ...) from the database queue in a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.JOB_WORKER_PROCESSES,
+                            help='Number of worker processes')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per round trip')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is drained')
+
+    def handle(self, *args, **options):
+        args = (options['batch_size'], options['poll_interval'], options['once'])
+        if options['processes'] <= 1:
+            worker_loop(*args)
+            return
+
+        # Workers are forked so they inherit the configured Django setup; each
+        # must open its own database connection.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=worker_loop, args=args) for _ in range(options['processes'])]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} workers.")
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            # Jobs a terminated worker had claimed are claimed again once their lease (JOB_LEASE_SECONDS) runs out
+            for worker in workers:
+                worker.terminate()
+        self.stdout.write(self.style.SUCCESS('Workers stopped.'))
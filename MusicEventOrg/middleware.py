@@ -0,0 +1,85 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.text import compress_sequence, compress_string
+
+try:
+    import brotli
+except ImportError:  # optional, responses are gzipped without it
+    brotli = None
+
+# API and export payloads only: HTML pages carry CSRF tokens, and compressing them
+# next to reflected input would open them to BREACH
+COMPRESSIBLE_TYPES = {'application/json', 'application/x-ndjson', 'application/xml', 'text/csv'}
+
+
+def accepted_encoding(request):
+    """'br' or 'gzip', whichever the client accepts (brotli preferred), or None."""
+    accepted = {}
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+    for encoding in (('br', 'gzip') if brotli else ('gzip',)):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor()
+    for chunk in sequence:
+        data = compressor.process(chunk)
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Like Django's GZipMiddleware, but negotiates brotli when it is installed
+    and leaves bodies under COMPRESSION_MIN_BYTES alone. Only the API and
+    export content types in COMPRESSIBLE_TYPES (and +json types) are
+    compressed. HTML, including the browsable API, is left alone: it carries
+    CSRF tokens and this middleware does not add GZipMiddleware's BREACH
+    padding.
+    """
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding') or getattr(response, 'is_async', False):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip()
+        if not (content_type in COMPRESSIBLE_TYPES or content_type.endswith('+json')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESSION_MIN_BYTES:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = accepted_encoding(request)
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if encoding == 'br':
+                response.streaming_content = brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(response.streaming_content)
+            del response.headers['Content-Length']
+        else:
+            compressed = brotli.compress(response.content) if encoding == 'br' else compress_string(response.content)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response.headers['Content-Length'] = str(len(response.content))
+
+        # The representation changed, so a strong ETag would no longer be accurate
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0004_event_image_alter_festival_organizer_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatMap',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('layout', models.JSONField(default=list)),
+                ('occupancy', models.BinaryField(default=bytes)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(condition=models.Q(('seat_number', ''), _negated=True), fields=('event', 'seat_number'), name='unique_event_seat'),
+        ),
+        migrations.AddField(
+            model_name='seatmap',
+            name='event',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='seat_map', to='MusicEventOrg.event'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0005_seatmap_ticket_unique_event_seat'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='hold_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('is_paid', False)), fields=['hold_expires_at'], name='ticket_open_hold_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0006_ticket_hold_expires_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ticket',
+            name='seat_number',
+            field=models.CharField(blank=True, max_length=10),
+        ),
+    ]
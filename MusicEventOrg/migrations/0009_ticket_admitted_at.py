@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0008_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='admitted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
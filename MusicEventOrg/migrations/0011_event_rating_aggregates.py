@@ -0,0 +1,70 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:10
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+AGGREGATE_FIELDS = ['rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def backfill_ratings(apps, schema_editor):
+    Event = apps.get_model('MusicEventOrg', 'Event')
+    Review = apps.get_model('MusicEventOrg', 'Review')
+    totals = defaultdict(lambda: dict.fromkeys(AGGREGATE_FIELDS, 0))
+    for row in Review.objects.values('event_id', 'rating').annotate(n=Count('id')).order_by():
+        aggregates = totals[row['event_id']]
+        aggregates['rating_sum'] += row['rating'] * row['n']
+        aggregates['rating_count'] += row['n']
+        aggregates[f"rating_{row['rating']}"] += row['n']
+    events = list(Event.objects.filter(pk__in=totals.keys()).only('pk'))
+    for event in events:
+        for field, value in totals[event.pk].items():
+            setattr(event, field, value)
+    Event.objects.bulk_update(events, AGGREGATE_FIELDS, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0010_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='rating_1',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_2',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_3',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_4',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_5',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_ratings, migrations.RunPython.noop),
+    ]
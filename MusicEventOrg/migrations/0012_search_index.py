@@ -0,0 +1,58 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def add_search_vector(apps, schema_editor):
+    # PostgreSQL only: a maintained tsvector column and GIN index; other databases use SearchTerm
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute("""
+        ALTER TABLE "MusicEventOrg_searchdocument" ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(body, '')), 'B')
+        ) STORED
+    """)
+    schema_editor.execute(
+        'CREATE INDEX searchdocument_vector_gin ON "MusicEventOrg_searchdocument" USING GIN (search_vector)'
+    )
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE "MusicEventOrg_searchdocument" DROP COLUMN search_vector')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0011_event_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='MusicEventOrg.event')),
+                ('title', models.TextField()),
+                ('body', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='terms', to='MusicEventOrg.searchdocument')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('term', 'document'), name='unique_search_term')],
+            },
+        ),
+        migrations.RunPython(add_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0013_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='performer',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0014_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='performer',
+            index=models.Index(fields=['name', 'id'], name='performer_name_id_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:25
+
+from django.db import migrations, models
+
+
+def seed_counters(apps, schema_editor):
+    model = lambda name: apps.get_model('MusicEventOrg', name)
+    counts = {
+        'events': model('Event').objects.count(),
+        'tickets_sold': model('Ticket').objects.filter(is_paid=True).count(),
+        'performers': model('Performer').objects.count(),
+        'festivals': model('Festival').objects.count(),
+    }
+    model('SiteCounter').objects.bulk_create(
+        [model('SiteCounter')(name=name, value=value) for name, value in counts.items()]
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0015_performer_name_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteCounter',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0016_sitecounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('payment_method', models.CharField(max_length=50)),
+                ('tickets', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='MusicEventOrg.event')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'event', 'payment_method'), name='unique_sales_rollup')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0017_salesrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='batch',
+            field=models.CharField(blank=True, max_length=32),
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('batch', ''), _negated=True), fields=['batch', 'status'], name='job_batch_idx'),
+        ),
+    ]
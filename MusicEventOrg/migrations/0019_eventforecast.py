@@ -0,0 +1,24 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0018_job_batch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventForecast',
+            fields=[
+                ('event', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='forecast', serialize=False, to='MusicEventOrg.event')),
+                ('daily_rate', models.FloatField()),
+                ('projected_sellout_date', models.DateField(blank=True, null=True)),
+                ('projected_attendance', models.PositiveIntegerField()),
+                ('computed_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0019_eventforecast'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='price_ceiling',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='event',
+            name='price_floor',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True),
+        ),
+        migrations.CreateModel(
+            name='PriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('new_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('event', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='MusicEventOrg.event')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['event', 'changed_at'], name='price_history_event_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0020_dynamic_pricing'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='ticket',
+            name='unique_event_seat',
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='released_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(condition=models.Q(models.Q(('seat_number', ''), _negated=True), ('released_at__isnull', True)), fields=('event', 'seat_number'), name='unique_event_seat'),
+        ),
+    ]
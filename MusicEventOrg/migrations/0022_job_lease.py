@@ -0,0 +1,21 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0021_ticket_released_at'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='job',
+            name='job_pending_idx',
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'running'])), fields=['run_after'], name='job_due_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+from collections import Counter
+import re
+
+from django.db import migrations
+
+# Frozen copy of the indexing rules in MusicEventOrg.search at the time the index was added
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+TITLE_WEIGHT = 4
+PERFORMER_WEIGHT = 2
+BODY_WEIGHT = 1
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower()) if len(token) > 1]
+
+
+def backfill_search_index(apps, schema_editor):
+    Event = apps.get_model('MusicEventOrg', 'Event')
+    SearchDocument = apps.get_model('MusicEventOrg', 'SearchDocument')
+    SearchTerm = apps.get_model('MusicEventOrg', 'SearchTerm')
+    postgres = schema_editor.connection.vendor == 'postgresql'
+    events = Event.objects.select_related('venue', 'festival').prefetch_related('performers')
+    for event in events.iterator(chunk_size=500):
+        title = event.title
+        performers = ' '.join(f"{performer.name} {performer.bio or ''}" for performer in event.performers.all())
+        rest = ' '.join(filter(None, [
+            event.description,
+            event.venue.name, event.venue.address,
+            event.festival.title if event.festival else '',
+        ]))
+        document, _ = SearchDocument.objects.update_or_create(
+            event=event, defaults={'title': title, 'body': f"{performers} {rest}"}
+        )
+        if postgres:
+            continue  # the generated tsvector column fills itself
+        weights = Counter()
+        for weight, text in ((TITLE_WEIGHT, title), (PERFORMER_WEIGHT, performers), (BODY_WEIGHT, rest)):
+            for term in set(tokenize(text)):
+                weights[term] += weight
+        SearchTerm.objects.filter(document=document).delete()
+        SearchTerm.objects.bulk_create([
+            SearchTerm(document=document, term=term, weight=weight) for term, weight in weights.items()
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('MusicEventOrg', '0022_job_lease'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_search_index, migrations.RunPython.noop),
+    ]
@@ -19,21 +19,45 @@ class Event(models.Model):
     date = models.DateTimeField()
     venue = models.ForeignKey(Venue, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=10, decimal_places=2)
+    # Bounds for MusicEventOrg.pricing; filled in from PRICING_FLOOR_RATIO/PRICING_CEILING_RATIO on first repricing
+    price_floor = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    price_ceiling = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     total_seats = models.PositiveIntegerField()
     available_seats = models.PositiveIntegerField()
     festival = models.ForeignKey('Festival', on_delete=models.SET_NULL, null=True, blank=True,
                                  related_name='events')  # Use string reference
     performers = models.ManyToManyField('Performer', related_name='events')  # Use string reference
     image = models.ImageField(upload_to='events/', blank=True, null=True)
+    # Resized copies of `image`, built in the background by MusicEventOrg.images: {"source": name, "widths": [...]}
+    image_variants = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
+    # Review aggregates, kept up to date by MusicEventOrg.ratings
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # Keyset pagination walks these for ?ordering=date / ?ordering=price
+        indexes = [
+            models.Index(fields=['date', 'id'], name='event_date_id_idx'),
+            models.Index(fields=['price', 'id'], name='event_price_id_idx'),
+        ]
+
     @property
     def average_rating(self):
-        reviews = self.reviews.all()
-        if reviews.exists():
-            return round(sum(review.rating for review in reviews) / reviews.count(), 1)
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 1)
         return 0
 
+    @property
+    def rating_histogram(self):
+        return {stars: getattr(self, f'rating_{stars}') for stars in range(1, 6)}
+
     def __str__(self):
         return self.title
 
@@ -41,12 +65,51 @@ class Event(models.Model):
 class Ticket(models.Model):
     user = models.ForeignKey('auth.User', on_delete=models.CASCADE, null=True, blank=True)
     event = models.ForeignKey('Event', on_delete=models.CASCADE)
-    seat_number = models.CharField(max_length=10)
+    seat_number = models.CharField(max_length=10, blank=True)  # blank for general admission
     is_paid = models.BooleanField(default=False)
+    # Event price when the seat was held; checkout charges this even if the event is repriced meanwhile
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     qr_code = models.ImageField(upload_to='qrcodes/', null=True, blank=True)
+    # Unpaid tickets hold their seat until this time, then the sweeper releases them
+    hold_expires_at = models.DateTimeField(null=True, blank=True)
+    # Set when the sweeper gives an expired hold's seat back; the row stays so a late payment can still find it
+    released_at = models.DateTimeField(null=True, blank=True)
+    admitted_at = models.DateTimeField(null=True, blank=True)  # set when scanned in at the gate
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['hold_expires_at'], condition=models.Q(is_paid=False), name='ticket_open_hold_idx'),
+        ]
+        constraints = [
+            # A seat can only be sold once per event; unassigned (general admission) and released tickets are exempt
+            models.UniqueConstraint(fields=['event', 'seat_number'],
+                                    condition=~models.Q(seat_number='') & models.Q(released_at__isnull=True),
+                                    name='unique_event_seat'),
+        ]
+
+    @property
+    def amount_due(self):
+        """The locked price; tickets held before prices were locked pay the event's current price."""
+        return self.price if self.price is not None else self.event.price
 
     def __str__(self):
-        return f"{self.user.username} - {self.event.title}"
+        return f"{self.user.username if self.user else 'Box office'} - {self.event.title}"
+
+
+class SeatMap(models.Model):
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, related_name='seat_map')
+    # List of sections: [{"name": "North", "seats": 1250, "seats_per_row": 25}, ...]
+    layout = models.JSONField(default=list)
+    # One bit per seat in layout order, set when the seat is taken
+    occupancy = models.BinaryField(default=bytes)
+
+    def clean(self):
+        from .seatmap import validate_layout  # seatmap imports the models
+
+        validate_layout(self.layout)
+
+    def __str__(self):
+        return f"Seat map for {self.event}"
 
 
 class Payment(models.Model):
@@ -56,6 +119,9 @@ class Payment(models.Model):
     transaction_id = models.CharField(max_length=255, unique=True)
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['timestamp', 'id'], name='payment_timestamp_id_idx')]
+
     def __str__(self):
         return f"{self.ticket.user.username} - {self.amount}"
 
@@ -67,6 +133,9 @@ class Review(models.Model):
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['created_at', 'id'], name='review_created_id_idx')]
+
     def __str__(self):
         return f"{self.user.username} - {self.event.title}"
 
@@ -75,9 +144,13 @@ class Performer(models.Model):
     name = models.CharField(max_length=255)
     bio = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='performers/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True)  # see Event.image_variants
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['name', 'id'], name='performer_name_id_idx')]
+
     def __str__(self):
         return self.name
 
@@ -94,3 +167,145 @@ class Festival(models.Model):
 
     def __str__(self):
         return self.title
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    kind = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Pending jobs run from this time on; for running jobs it is the end of the worker's lease
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    batch = models.CharField(max_length=32, blank=True)  # groups jobs queued together, for progress reports
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['run_after'], condition=models.Q(status__in=['pending', 'running']),
+                         name='job_due_idx'),
+            models.Index(fields=['batch', 'status'], condition=~models.Q(batch=''), name='job_batch_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.id} ({self.status})"
+
+
+class Notification(models.Model):
+    SMS = 'sms'
+    EMAIL = 'email'
+    CHANNEL_CHOICES = [(SMS, 'SMS'), (EMAIL, 'Email')]
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(PENDING, 'Pending'), (SENT, 'Sent'), (FAILED, 'Failed')]
+
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    recipient = models.CharField(max_length=254)  # phone number or email address
+    subject = models.CharField(max_length=255, blank=True)
+    body = models.TextField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['next_attempt_at'], condition=models.Q(status='pending'),
+                         name='notification_pending_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.channel} to {self.recipient} ({self.status})"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized search text for an event: its own fields plus its venue, festival and performers.
+
+    On PostgreSQL a generated tsvector column (search_vector) with a GIN index
+    is added to this table by migration; elsewhere SearchTerm rows form the index.
+    """
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='search_document')
+    title = models.TextField()
+    body = models.TextField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.title
+
+
+class SearchTerm(models.Model):
+    """Inverted index entry used when the database has no full-text search."""
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='terms')
+    term = models.CharField(max_length=64)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'document'], name='unique_search_term'),
+        ]
+
+    def __str__(self):
+        return self.term
+
+
+class SiteCounter(models.Model):
+    """Running totals for the admin dashboard, maintained by MusicEventOrg.counters."""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name}: {self.value}"
+
+
+class SalesRollup(models.Model):
+    """Tickets sold and revenue per day, event and payment method, maintained by MusicEventOrg.rollups."""
+    day = models.DateField()
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='sales_rollups')
+    payment_method = models.CharField(max_length=50)
+    tickets = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'event', 'payment_method'], name='unique_sales_rollup'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.event_id} {self.payment_method}: {self.tickets}"
+
+
+class EventForecast(models.Model):
+    """Projected ticket sales for an upcoming event, recomputed in batch by MusicEventOrg.forecast."""
+    event = models.OneToOneField(Event, on_delete=models.CASCADE, primary_key=True, related_name='forecast')
+    daily_rate = models.FloatField()  # tickets per day on the fitted trend, as of computed_at
+    projected_sellout_date = models.DateField(null=True, blank=True)  # empty if not expected to sell out
+    projected_attendance = models.PositiveIntegerField()
+    computed_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.event_id}: {self.projected_attendance}"
+
+
+class PriceHistory(models.Model):
+    """One row per price change made by MusicEventOrg.pricing."""
+    event = models.ForeignKey(Event, on_delete=models.CASCADE, related_name='price_history')
+    old_price = models.DecimalField(max_digits=10, decimal_places=2)
+    new_price = models.DecimalField(max_digits=10, decimal_places=2)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [models.Index(fields=['event', 'changed_at'], name='price_history_event_idx')]
+
+    def __str__(self):
+        return f"{self.event_id}: {self.old_price} -> {self.new_price}"
@@ -0,0 +1,97 @@
+from datetime import timedelta
+import logging
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Notification
+from .sms import send_sms
+
+logger = logging.getLogger(__name__)
+
+
+def queue_sms(phone_number, message):
+    """Add an SMS to the outbox; it is sent by dispatch() once the caller's transaction commits."""
+    return Notification.objects.create(channel=Notification.SMS, recipient=phone_number, body=message)
+
+
+def queue_email(recipient, subject, body):
+    return Notification.objects.create(channel=Notification.EMAIL, recipient=recipient, subject=subject, body=body)
+
+
+def claim(batch_size):
+    with transaction.atomic():
+        ids = list(
+            Notification.objects.select_for_update(skip_locked=True)
+            .filter(status=Notification.PENDING, next_attempt_at__lte=timezone.now())
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        # Push the claimed rows out of reach of other dispatchers while we send them
+        Notification.objects.filter(id__in=ids).update(
+            attempts=F('attempts') + 1, next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+    return list(Notification.objects.filter(id__in=ids))
+
+
+def mark_sent(notification):
+    notification.status = Notification.SENT
+    notification.sent_at = timezone.now()
+    notification.last_error = ''
+
+
+def mark_failed(notification, error):
+    notification.last_error = str(error)
+    if notification.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+        notification.status = Notification.FAILED
+    else:
+        delay = settings.NOTIFICATION_RETRY_BASE_SECONDS * 2 ** (notification.attempts - 1)
+        notification.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+
+def send_sms_batch(notifications):
+    for notification in notifications:
+        try:
+            send_sms(notification.recipient, notification.body)
+        except Exception as exc:
+            logger.warning(f"SMS {notification.id} to {notification.recipient} failed: {exc}")
+            mark_failed(notification, exc)
+        else:
+            mark_sent(notification)
+
+
+def send_email_batch(notifications):
+    # One SMTP connection for the whole batch; each message is sent on its own so one bad address doesn't fail the rest
+    try:
+        connection = get_connection()
+        connection.open()
+    except Exception as exc:
+        logger.warning(f"Could not connect to the mail server: {exc}")
+        for notification in notifications:
+            mark_failed(notification, exc)
+        return
+    try:
+        for notification in notifications:
+            message = EmailMessage(notification.subject, notification.body, settings.DEFAULT_FROM_EMAIL,
+                                   [notification.recipient], connection=connection)
+            try:
+                connection.send_messages([message])
+            except Exception as exc:
+                logger.warning(f"Email {notification.id} to {notification.recipient} failed: {exc}")
+                mark_failed(notification, exc)
+            else:
+                mark_sent(notification)
+    finally:
+        connection.close()
+
+
+def dispatch(batch_size=100):
+    """Send one batch of due notifications; returns how many were attempted."""
+    notifications = claim(batch_size)
+    send_sms_batch([n for n in notifications if n.channel == Notification.SMS])
+    send_email_batch([n for n in notifications if n.channel == Notification.EMAIL])
+    Notification.objects.bulk_update(notifications, ['status', 'sent_at', 'last_error', 'next_attempt_at'])
+    return len(notifications)
@@ -0,0 +1,145 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination keyed on (ordering field, id).
+
+    Each page is a range scan on the composite index from the last row of the
+    previous page, so page 10,000 costs the same as page 1 and there is no
+    COUNT(*). The ordering comes from OrderingFilter (or search ranking) when
+    present, otherwise from the view's `ordering`, otherwise newest id first.
+    """
+    cursor_query_param = 'cursor'
+    limit_query_param = 'limit'
+    max_limit = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        field, descending = self.get_ordering(queryset, view)
+        self.field = field
+        self.output_field = self.get_output_field(queryset, field)
+        cursor = self.decode_cursor(request)
+        backwards = cursor is not None and cursor['d'] == 'p'
+
+        # Walking backwards is the same scan with the ordering flipped
+        scan_descending = descending != backwards
+        scan_prefix = '-' if scan_descending else ''
+        if field == 'pk':
+            queryset = queryset.order_by(f'{scan_prefix}pk')
+        else:
+            queryset = queryset.order_by(f'{scan_prefix}{field}', f'{scan_prefix}pk')
+        if cursor is not None:
+            queryset = queryset.filter(self.after(field, cursor, scan_descending))
+
+        # One extra row tells whether there is anything beyond this page
+        rows = list(queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = True, has_more
+        else:
+            has_next, has_previous = has_more, cursor is not None
+
+        self.next_position = self.position(rows[-1]) if rows and has_next else None
+        self.previous_position = self.position(rows[0]) if rows and has_previous else None
+        return rows
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params[self.limit_query_param])
+        except (KeyError, ValueError):
+            return settings.REST_FRAMEWORK.get('PAGE_SIZE') or 10
+        return max(1, min(limit, self.max_limit))
+
+    def get_ordering(self, queryset, view):
+        ordering = list(queryset.query.order_by) or list(getattr(view, 'ordering', None) or []) or ['-pk']
+        first = ordering[0]
+        descending = first.startswith('-')
+        field = first.lstrip('-')
+        return ('pk' if field in ('id', 'pk') else field), descending
+
+    def get_output_field(self, queryset, field):
+        if field == 'pk':
+            return queryset.model._meta.pk
+        if field in queryset.query.annotations:
+            return queryset.query.annotations[field].output_field
+        try:
+            return queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            raise NotFound(f'Cannot paginate on {field}')
+
+    def after(self, field, cursor, descending):
+        lookup = 'lt' if descending else 'gt'
+        if field == 'pk':
+            return Q(**{f'pk__{lookup}': cursor['id']})
+        value = cursor['v']
+        return Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'pk__{lookup}': cursor['id']})
+
+    def position(self, obj):
+        value = None if self.field == 'pk' else getattr(obj, self.field)
+        return {'v': None if value is None else str(value), 'id': obj.pk}
+
+    def encode_cursor(self, position, direction):
+        data = json.dumps(dict(position, d=direction), separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded + '=' * (-len(encoded) % 4)))
+            if cursor['d'] not in ('n', 'p') or not isinstance(cursor['id'], int):
+                raise ValueError
+            if self.field != 'pk':
+                # Cursors come from the client: a value the ordering field can't hold is a bad cursor, not a 500
+                cursor['v'] = self.output_field.to_python(cursor['v'])
+                if cursor['v'] is None:
+                    raise ValueError
+        except (ValueError, KeyError, TypeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def get_link(self, position, direction):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, direction))
+
+    def get_next_link(self):
+        return self.get_link(self.next_position, 'n')
+
+    def get_previous_link(self):
+        return self.get_link(self.previous_position, 'p')
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
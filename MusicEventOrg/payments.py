@@ -113,13 +113,49 @@
 #         except Exception as e:
 #             return {"error": f"Verification error: {str(e)}"}
 
+from decimal import Decimal, InvalidOperation
+import logging
+
 import requests
 from django.conf import settings
 from django.db import transaction
+from .booking import renew_hold
 from .models import Ticket, Payment
-from .utils import generate_qr_code
+from .jobs import enqueue
 import paypalrestsdk
 
+logger = logging.getLogger(__name__)
+
+ALREADY_PAID = "Ticket is already paid"
+SEAT_GONE = "The seat held for this ticket is no longer available"
+WRONG_AMOUNT = "Payment amount does not match the ticket price"
+
+
+def parse_amount(value):
+    """A gateway's amount as a Decimal, or None if it is not a finite number."""
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        return None
+    return amount if amount.is_finite() else None
+
+
+def lock_ticket(ticket_id):
+    """Load a ticket with its row locked; call inside transaction.atomic()."""
+    return Ticket.objects.select_for_update(of=('self',)).select_related('event').get(id=ticket_id)
+
+
+def hold_for_checkout(ticket_id):
+    """Lock the ticket and renew its hold before sending the customer to a gateway; returns (ticket, error)."""
+    with transaction.atomic():
+        ticket = lock_ticket(ticket_id)
+        if ticket.is_paid:
+            return ticket, {"error": ALREADY_PAID}
+        if not renew_hold(ticket):
+            return ticket, {"error": SEAT_GONE}
+    return ticket, None
+
+
 class EsewaPayment:
     # Existing eSewa code (unchanged)
     ESEWA_URL = settings.ESEWA_CONFIG.get('payment_url', 'https://uat.esewa.com.np/epay/main')
@@ -131,8 +167,10 @@ class EsewaPayment:
     @staticmethod
     def initiate_payment(ticket_id):
         try:
-            ticket = Ticket.objects.get(id=ticket_id)
-            amount = str(ticket.event.price)
+            ticket, error = hold_for_checkout(ticket_id)
+            if error:
+                return error
+            amount = str(ticket.amount_due)  # locked when the seat was held, not the current event price
             payment_data = {
                 'amt': amount,
                 'pdc': '0',
@@ -156,21 +194,50 @@ class EsewaPayment:
             'pid': oid,
             'scd': EsewaPayment.MERCHANT_CODE,
         }
-        response = requests.post(EsewaPayment.VERIFICATION_URL, data=payload)
-        if "Success" in response.text:
+        try:
             ticket_id = int(oid.split('_')[1])
-            ticket = Ticket.objects.get(id=ticket_id)
+        except (AttributeError, IndexError, ValueError):
+            return {"error": "Invalid payment reference"}
+        amount = parse_amount(amt)
+        if amount is None:
+            return {"error": "Invalid payment amount"}
+        try:
+            ticket = Ticket.objects.select_related('event').get(id=ticket_id)
+        except Ticket.DoesNotExist:
+            return {"error": "Ticket not found"}
+        if ticket.is_paid:
+            return {"error": ALREADY_PAID}
+        # The hold's locked price, so a repricing during checkout can't change what is owed
+        if amount != ticket.amount_due:
+            return {"error": WRONG_AMOUNT}
+        # Ask eSewa before locking anything, so a slow gateway never holds the ticket row
+        try:
+            response = requests.post(EsewaPayment.VERIFICATION_URL, data=payload,
+                                     timeout=settings.ESEWA_VERIFY_TIMEOUT)
+        except requests.RequestException as e:
+            logger.warning(f"eSewa verification for ticket {ticket_id} failed: {e}")
+            return {"error": "Payment verification failed"}
+        if "Success" not in response.text:
+            return {"error": "Payment verification failed"}
+        with transaction.atomic():
+            ticket = lock_ticket(ticket_id)
+            if ticket.is_paid:
+                return {"error": ALREADY_PAID}  # a concurrent callback for the same payment got here first
+            # eSewa has already taken the money; a hold released meanwhile takes its seat back if it can
+            if not renew_hold(ticket):
+                logger.error(f"eSewa payment {ref_id} for ticket {ticket_id} arrived after its seat was resold")
+                return {"error": f"{SEAT_GONE}; the payment will be refunded"}
             ticket.is_paid = True
-            ticket.save()
+            ticket.hold_expires_at = None
+            ticket.save(update_fields=['is_paid', 'hold_expires_at'])
             Payment.objects.create(
                 ticket=ticket,
                 amount=amt,
                 payment_method='esewa',
                 transaction_id=ref_id
             )
-            generate_qr_code(ticket.id)
-            return {"message": "Payment successful", "ticket_id": ticket_id}
-        return {"error": "Payment verification failed"}
+            enqueue('generate_qr_code', ticket_id=ticket.id)
+        return {"message": "Payment successful", "ticket_id": ticket_id}
 
 class PaypalPayment:
     @staticmethod
@@ -184,7 +251,10 @@ class PaypalPayment:
     @staticmethod
     def initiate_payment(ticket_id):
         try:
-            ticket = Ticket.objects.get(id=ticket_id)
+            ticket, error = hold_for_checkout(ticket_id)
+            if error:
+                return error
+            price = str(ticket.amount_due)  # locked when the seat was held, not the current event price
             PaypalPayment.configure()
             payment = paypalrestsdk.Payment({
                 "intent": "sale",
@@ -195,7 +265,7 @@ class PaypalPayment:
                 },
                 "transactions": [{
                     "amount": {
-                        "total": str(ticket.event.price),
+                        "total": price,
                         "currency": "USD",  # Adjust currency as needed
                     },
                     "description": f"Ticket for {ticket.event.title}",
@@ -203,7 +273,7 @@ class PaypalPayment:
                         "items": [{
                             "name": ticket.event.title,
                             "sku": f"ticket_{ticket.id}",
-                            "price": str(ticket.event.price),
+                            "price": price,
                             "currency": "USD",
                             "quantity": 1
                         }]
@@ -224,19 +294,28 @@ class PaypalPayment:
         try:
             PaypalPayment.configure()
             payment = paypalrestsdk.Payment.find(payment_id)
+            ticket_id = int(payment.transactions[0].item_list.items[0].sku.split('_')[1])
             with transaction.atomic():
+                # Lock the ticket and make sure it still holds its seat before the customer is charged
+                ticket = lock_ticket(ticket_id)
+                if ticket.is_paid:
+                    return {"error": ALREADY_PAID}
+                if not renew_hold(ticket):
+                    return {"error": SEAT_GONE}
+                # Capture only the hold's locked price, whatever the approved payment was created for
+                if parse_amount(payment.transactions[0].amount.total) != ticket.amount_due:
+                    return {"error": WRONG_AMOUNT}
                 if payment.execute({"payer_id": payer_id}):
-                    ticket_id = int(payment.transactions[0].item_list.items[0].sku.split('_')[1])
-                    ticket = Ticket.objects.get(id=ticket_id)
                     ticket.is_paid = True
-                    ticket.save()
+                    ticket.hold_expires_at = None
+                    ticket.save(update_fields=['is_paid', 'hold_expires_at'])
                     Payment.objects.create(
                         ticket=ticket,
                         amount=payment.transactions[0].amount.total,
                         payment_method='paypal',
                         transaction_id=payment.id
                     )
-                    generate_qr_code(ticket.id)
+                    enqueue('generate_qr_code', ticket_id=ticket.id)
                     return {"message": "Payment successful", "ticket_id": ticket_id}
                 return {"error": "Payment execution failed"}
         except Ticket.DoesNotExist:
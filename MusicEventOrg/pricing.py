@@ -0,0 +1,78 @@
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+import numpy as np
+
+from . import caching
+from .forecast import load_sales
+from .models import Event, PriceHistory
+
+
+def to_array(values):
+    """Decimal values as floats, None as NaN."""
+    return np.array([np.nan if value is None else float(value) for value in values])
+
+
+def reprice(price, floor, ceiling, available, days_to_show, on_sale, sales):
+    """
+    New prices for all events at once.
+
+    Demand pace is the recent daily sales rate times the days left, over the
+    seats left: above 1 the event is selling faster than it has seats, below
+    1 slower. Prices move by up to PRICING_MAX_STEP per run in proportion to
+    log2(pace), are rounded to PRICING_ROUND_TO and kept within the floor and
+    ceiling. Prices only drop once a full PRICING_WINDOW_DAYS of sales is in,
+    and sold-out events are left alone.
+    """
+    days_on_sale = on_sale.sum(axis=1)
+    rate = (sales * on_sale).sum(axis=1) / np.maximum(days_on_sale, 1)
+    pace = rate * np.maximum(days_to_show, 1) / np.maximum(available, 1)
+    pressure = np.clip(np.log2(np.maximum(pace, 1e-9)), -1, 1)
+    pressure = np.where(days_on_sale < sales.shape[1], np.maximum(pressure, 0), pressure)
+
+    step = settings.PRICING_ROUND_TO
+    target = np.round(price * (1 + settings.PRICING_MAX_STEP * pressure) / step) * step
+    target = np.clip(target, floor, ceiling)
+    return np.where(available > 0, target, price)
+
+
+def reprice_events(dry_run=False):
+    """
+    Reprice every upcoming event; returns [(event id, old price, new price), ...] for the changes.
+
+    All new prices, and the floors/ceilings filled in for events repriced for
+    the first time, are written with one bulk_update next to their
+    PriceHistory rows. Tickets already held keep the price they were held at.
+    """
+    loaded = load_sales(settings.PRICING_WINDOW_DAYS, ('price', 'price_floor', 'price_ceiling'))
+    if loaded is None:
+        return []
+    ids, available, _, days_to_show, on_sale, sales, fields = loaded
+    price, floor, ceiling = (to_array(fields[name]) for name in ('price', 'price_floor', 'price_ceiling'))
+    missing_bounds = np.isnan(floor) | np.isnan(ceiling)
+    floor = np.where(np.isnan(floor), np.round(price * settings.PRICING_FLOOR_RATIO, 2), floor)
+    ceiling = np.where(np.isnan(ceiling), np.round(price * settings.PRICING_CEILING_RATIO, 2), ceiling)
+    new_price = reprice(price, floor, ceiling, available, days_to_show, on_sale, sales)
+
+    changed = np.round(new_price, 2) != np.round(price, 2)
+    changes = [(int(ids[i]), fields['price'][i], Decimal(f'{new_price[i]:.2f}')) for i in np.flatnonzero(changed)]
+    if dry_run:
+        return changes
+
+    now = timezone.now()
+    new_prices = {event_id: new for event_id, _, new in changes}
+    events = [
+        Event(pk=int(ids[i]), price=new_prices.get(int(ids[i]), fields['price'][i]),
+              price_floor=Decimal(f'{floor[i]:.2f}'), price_ceiling=Decimal(f'{ceiling[i]:.2f}'), updated_at=now)
+        for i in np.flatnonzero(changed | missing_bounds)
+    ]
+    with transaction.atomic():
+        # update() and bulk_update() skip auto_now: updated_at is set above so cached copies are revalidated
+        Event.objects.bulk_update(events, ['price', 'price_floor', 'price_ceiling', 'updated_at'], batch_size=500)
+        PriceHistory.objects.bulk_create(
+            [PriceHistory(event_id=event_id, old_price=old, new_price=new, changed_at=now)
+             for event_id, old, new in changes], batch_size=1000)
+    caching.invalidate_events(list(new_prices))
+    return changes
@@ -0,0 +1,56 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import Event, Review
+
+AGGREGATE_FIELDS = ['rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5']
+
+
+def apply_rating(event_id, rating, delta):
+    """Add (delta=1) or remove (delta=-1) one rating from an event's aggregates with a single UPDATE."""
+    Event.objects.filter(pk=event_id).update(**{
+        'rating_sum': F('rating_sum') + rating * delta,
+        'rating_count': F('rating_count') + delta,
+        f'rating_{rating}': F(f'rating_{rating}') + delta,
+        'updated_at': timezone.now(),
+    })
+
+
+def review_added(review):
+    apply_rating(review.event_id, review.rating, 1)
+
+
+def review_removed(review):
+    apply_rating(review.event_id, review.rating, -1)
+
+
+def review_changed(old_event_id, old_rating, review):
+    if (old_event_id, old_rating) != (review.event_id, review.rating):
+        apply_rating(old_event_id, old_rating, -1)
+        apply_rating(review.event_id, review.rating, 1)
+
+
+def rebuild_aggregates():
+    """Recompute every event's rating aggregates from the reviews table with one GROUP BY."""
+    totals = defaultdict(lambda: dict.fromkeys(AGGREGATE_FIELDS, 0))
+    for row in Review.objects.values('event_id', 'rating').annotate(n=Count('id')).order_by():
+        aggregates = totals[row['event_id']]
+        aggregates['rating_sum'] += row['rating'] * row['n']
+        aggregates['rating_count'] += row['n']
+        aggregates[f"rating_{row['rating']}"] += row['n']
+
+    now = timezone.now()
+    with transaction.atomic():
+        Event.objects.exclude(pk__in=totals.keys()).exclude(rating_count=0).update(
+            updated_at=now, **dict.fromkeys(AGGREGATE_FIELDS, 0)
+        )
+        events = list(Event.objects.filter(pk__in=totals.keys()).only('pk'))
+        for event in events:
+            for field, value in totals[event.pk].items():
+                setattr(event, field, value)
+            event.updated_at = now
+        Event.objects.bulk_update(events, AGGREGATE_FIELDS + ['updated_at'], batch_size=500)
+    return len(events)
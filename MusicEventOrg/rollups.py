@@ -0,0 +1,106 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Payment, SalesRollup
+
+METRICS = ('tickets', 'revenue')
+# Chart grouping -> (rollup column to group by, column naming each series)
+GROUPS = {
+    'total': None,
+    'event': ('event_id', 'event__title'),
+    'festival': ('event__festival_id', 'event__festival__title'),
+    'payment_method': ('payment_method', 'payment_method'),
+}
+
+
+def record_payment(payment):
+    """
+    Add a new payment to its day's rollup once the transaction commits.
+
+    Deleted payments are not taken off; `backfill_sales_rollups --since`
+    recomputes the affected days from the Payment table.
+    """
+    record_sales([(payment.timestamp, payment.ticket.event_id, payment.payment_method, payment.amount)])
+
+
+def record_sales(sales):
+    """
+    Like record_payment() for (timestamp, event id, payment method, amount) tuples, e.g. of
+    payments written with bulk_create(), which sends no post_save. One UPDATE per rollup row.
+    """
+    totals = defaultdict(lambda: [0, Decimal(0)])
+    for timestamp, event_id, payment_method, amount in sales:
+        total = totals[timezone.localdate(timestamp), event_id, payment_method]
+        total[0] += 1
+        total[1] += Decimal(str(amount))  # verify_payment passes the gateway's string amount
+    for key, (tickets, revenue) in totals.items():
+        transaction.on_commit(lambda key=key, tickets=tickets, revenue=revenue: _add(*key, tickets, revenue))
+
+
+def _add(day, event_id, payment_method, tickets, revenue):
+    rows = SalesRollup.objects.filter(day=day, event_id=event_id, payment_method=payment_method)
+    changes = {'tickets': F('tickets') + tickets, 'revenue': F('revenue') + revenue}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            SalesRollup.objects.create(day=day, event_id=event_id, payment_method=payment_method,
+                                       tickets=tickets, revenue=revenue)
+    except IntegrityError:
+        rows.update(**changes)  # another payment created the row first
+
+
+def rebuild(since=None):
+    """Recompute the rollups from the Payment table (from `since` on, or all of them); returns the row count."""
+    payments = Payment.objects.all()
+    rollups = SalesRollup.objects.all()
+    if since is not None:
+        payments = payments.filter(timestamp__date__gte=since)
+        rollups = rollups.filter(day__gte=since)
+    totals = (payments.annotate(day=TruncDate('timestamp'))
+              .values('day', 'ticket__event_id', 'payment_method')
+              .annotate(tickets=Count('pk'), revenue=Sum('amount'))
+              .order_by())
+    with transaction.atomic():
+        rollups.delete()
+        created = SalesRollup.objects.bulk_create(
+            [SalesRollup(day=row['day'], event_id=row['ticket__event_id'], payment_method=row['payment_method'],
+                         tickets=row['tickets'], revenue=row['revenue']) for row in totals],
+            batch_size=1000)
+    return len(created)
+
+
+def daily_series(metric, group='total', days=30, limit=10, **filters):
+    """
+    ([day, ...], [series name, ...], [[value per day], ...]) for the last `days` days.
+
+    Reads one row per day and series from the rollup table. Only the `limit`
+    largest series are kept; the rest are summed into "Other".
+    """
+    end = timezone.localdate()
+    labels = [end - timedelta(days=offset) for offset in range(days - 1, -1, -1)]
+    rows = SalesRollup.objects.filter(day__gte=labels[0], day__lte=end, **filters)
+    if GROUPS[group] is None:
+        values = dict(rows.values('day').annotate(value=Sum(metric)).order_by().values_list('day', 'value'))
+        return labels, ['Total'], [[float(values.get(day, 0)) for day in labels]]
+
+    key, name = GROUPS[group]
+    series = defaultdict(lambda: defaultdict(float))
+    names = {}
+    for row in rows.values('day', key, name).annotate(value=Sum(metric)).order_by():
+        series[row[key]][row['day']] += float(row['value'])
+        names[row[key]] = row[name]
+    ranked = sorted(series, key=lambda k: sum(series[k].values()), reverse=True)
+    keep, rest = ranked[:limit], ranked[limit:]
+    providers = [str(names[k]) if names[k] is not None else 'None' for k in keep]
+    data = [[series[k][day] for day in labels] for k in keep]
+    if rest:
+        providers.append('Other')
+        data.append([sum(series[k][day] for k in rest) for day in labels])
+    return labels, providers, data
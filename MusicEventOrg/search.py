@@ -0,0 +1,110 @@
+from collections import Counter
+import re
+
+from django.db import connection, transaction
+from django.db.models import BooleanField, Count, FloatField, OuterRef, Subquery, Sum
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+from .models import Event, SearchDocument, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+TITLE_WEIGHT = 4
+PERFORMER_WEIGHT = 2
+BODY_WEIGHT = 1
+
+
+def use_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall((text or '').lower()) if len(token) > 1]
+
+
+def document_parts(event):
+    """(title, performer text, rest) for an event whose venue, festival and performers are loaded."""
+    performers = ' '.join(f"{performer.name} {performer.bio or ''}" for performer in event.performers.all())
+    rest = ' '.join(filter(None, [
+        event.description,
+        event.venue.name, event.venue.address,
+        event.festival.title if event.festival else '',
+    ]))
+    return event.title, performers, rest
+
+
+def index_events(event_ids):
+    """(Re)build the search documents of the given events."""
+    events = (Event.objects.filter(pk__in=event_ids)
+              .select_related('venue', 'festival').prefetch_related('performers'))
+    with transaction.atomic():
+        for event in events:
+            title, performers, rest = document_parts(event)
+            document, _ = SearchDocument.objects.update_or_create(
+                event=event, defaults={'title': title, 'body': f"{performers} {rest}"}
+            )
+            if use_postgres():
+                continue  # the generated tsvector column keeps itself up to date
+            weights = Counter()
+            for weight, text in ((TITLE_WEIGHT, title), (PERFORMER_WEIGHT, performers), (BODY_WEIGHT, rest)):
+                for term in set(tokenize(text)):
+                    weights[term] += weight
+            SearchTerm.objects.filter(document=document).delete()
+            SearchTerm.objects.bulk_create([
+                SearchTerm(document=document, term=term, weight=weight) for term, weight in weights.items()
+            ])
+
+
+def reindex_related(venue_id=None, performer_id=None, festival_id=None, chunk_size=500):
+    """Rebuild the documents of every event that shows the given venue, performer or festival."""
+    events = Event.objects.all()
+    if venue_id is not None:
+        events = events.filter(venue_id=venue_id)
+    if performer_id is not None:
+        events = events.filter(performers=performer_id)
+    if festival_id is not None:
+        events = events.filter(festival_id=festival_id)
+    event_ids = list(events.values_list('pk', flat=True))
+    for start in range(0, len(event_ids), chunk_size):
+        index_events(event_ids[start:start + chunk_size])
+    return len(event_ids)
+
+
+def search_events(queryset, query):
+    """
+    Restrict an Event queryset to matches for `query`, best first.
+
+    Uses the tsvector/GIN index on PostgreSQL and the SearchTerm inverted
+    index elsewhere; either way only matching documents are visited.
+    """
+    if use_postgres():
+        tsquery = "websearch_to_tsquery('english', %s)"
+        matching = SearchDocument.objects.annotate(
+            matches=RawSQL(f"search_vector @@ {tsquery}", (query,), output_field=BooleanField())
+        ).filter(matches=True).values('event_id')
+        rank = SearchDocument.objects.filter(event=OuterRef('pk')).annotate(
+            rank=RawSQL(f"ts_rank(search_vector, {tsquery})", (query,), output_field=FloatField())
+        ).values('rank')[:1]
+    else:
+        terms = set(tokenize(query))
+        if not terms:
+            return queryset.none()
+        # Every term must match; the score is the sum of the term weights
+        matching = (SearchTerm.objects.filter(term__in=terms).values('document_id')
+                    .annotate(hits=Count('term')).filter(hits=len(terms)).values('document_id'))
+        rank = (SearchTerm.objects.filter(document_id=OuterRef('pk'), term__in=terms)
+                .values('document_id').annotate(score=Sum('weight')).values('score')[:1])
+    return (queryset.filter(pk__in=matching)
+            .annotate(search_rank=Subquery(rank, output_field=FloatField()))
+            .order_by('-search_rank', 'pk'))
+
+
+class EventSearchFilter(SearchFilter):
+    """Drop-in replacement for SearchFilter that goes through the search index instead of LIKE scans."""
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search_events(queryset, ' '.join(terms))
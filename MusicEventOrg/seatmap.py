@@ -0,0 +1,170 @@
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from .models import SeatMap, Ticket
+
+DEFAULT_SEATS_PER_ROW = 20
+
+
+def row_label(index):
+    """0 -> A, 25 -> Z, 26 -> AA, ... like spreadsheet columns."""
+    label = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        label = chr(ord('A') + remainder) + label
+    return label
+
+
+def default_layout(total_seats, seats_per_row=DEFAULT_SEATS_PER_ROW):
+    return [{'name': 'Main', 'seats': total_seats, 'seats_per_row': seats_per_row}]
+
+
+class SeatBitmap:
+    """Occupancy of every seat of an event packed one bit per seat."""
+
+    def __init__(self, size, data=b''):
+        self.size = size
+        self.bits = bytearray(data)
+        needed = (size + 7) // 8
+        if len(self.bits) < needed:
+            self.bits.extend(bytes(needed - len(self.bits)))
+
+    def __contains__(self, index):
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def add(self, index):
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def discard(self, index):
+        self.bits[index >> 3] &= ~(1 << (index & 7)) & 0xFF
+
+    def count(self):
+        return sum(bin(byte).count('1') for byte in self.bits)
+
+    def to_bytes(self):
+        return bytes(self.bits)
+
+
+class SeatLayout:
+    """Maps seat labels to bit positions for a seat map layout."""
+
+    def __init__(self, sections):
+        self.sections = []
+        offset = 0
+        for section in sections:
+            self.sections.append((section['name'], offset, section['seats'], section['seats_per_row']))
+            offset += section['seats']
+        self.size = offset
+        # Single-section layouts keep the short "A1" labels used so far
+        self.prefixed = len(self.sections) > 1
+
+    def label(self, index):
+        for name, offset, seats, per_row in self.sections:
+            if index < offset + seats:
+                row, number = divmod(index - offset, per_row)
+                label = f"{row_label(row)}{number + 1}"
+                return f"{name}-{label}" if self.prefixed else label
+        raise IndexError(index)
+
+    def index(self, label):
+        """Bit position of a seat label, or None if the layout has no such seat."""
+        if self.prefixed:
+            name, _, label = label.rpartition('-')
+        else:
+            name = None
+        letters = label.rstrip('0123456789')
+        digits = label[len(letters):]
+        if not letters.isalpha() or not letters.isupper() or not digits:
+            return None
+        row = 0
+        for char in letters:
+            row = row * 26 + ord(char) - ord('A') + 1
+        row -= 1
+        number = int(digits) - 1
+        for section_name, offset, seats, per_row in self.sections:
+            if name is not None and section_name != name:
+                continue
+            position = row * per_row + number
+            if 0 <= number < per_row and position < seats:
+                return offset + position
+            return None
+        return None
+
+
+def validate_layout(sections):
+    """
+    Raise ValidationError unless `sections` is a usable seat map layout.
+
+    Every seat label has to fit in Ticket.seat_number, so a long section name
+    or too many rows is rejected here instead of failing at booking time.
+    """
+    max_length = Ticket._meta.get_field('seat_number').max_length
+    try:
+        layout = SeatLayout(sections)
+    except (KeyError, TypeError):
+        raise ValidationError('Each section needs a name, seats and seats_per_row.')
+    names = [name for name, _, _, _ in layout.sections]
+    if not names or len(set(names)) != len(names):
+        raise ValidationError('A layout needs at least one section and unique section names.')
+    for name, _, seats, per_row in layout.sections:
+        if not isinstance(seats, int) or not isinstance(per_row, int) or seats < 1 or per_row < 1:
+            raise ValidationError(f'Section {name} needs a positive number of seats and seats_per_row.')
+        # The last row has the longest letters; the widest seat number is the row length
+        longest = len(row_label((seats - 1) // per_row)) + len(str(min(seats, per_row)))
+        if layout.prefixed:
+            longest += len(f'{name}-')
+        if longest > max_length:
+            raise ValidationError(f'Seat labels in section {name} run to {longest} characters; '
+                                  f'seat numbers hold at most {max_length}.')
+
+
+def get_seat_map(event):
+    """
+    Load the event's seat map, creating it from total_seats on first use.
+
+    A new map is seeded from tickets that already carry a seat number so
+    seats sold before the map existed stay taken.
+    """
+    try:
+        return SeatMap.objects.get(event=event)
+    except SeatMap.DoesNotExist:
+        pass
+    seat_map = SeatMap(event=event, layout=default_layout(event.total_seats))
+    layout = SeatLayout(seat_map.layout)
+    bitmap = SeatBitmap(layout.size)
+    sold = (Ticket.objects.filter(event=event, released_at__isnull=True).exclude(seat_number='')
+            .values_list('seat_number', flat=True))
+    for seat_number in sold.iterator():
+        index = layout.index(seat_number)
+        if index is not None:
+            bitmap.add(index)
+    seat_map.occupancy = bitmap.to_bytes()
+    try:
+        with transaction.atomic():  # may run inside a booking
+            seat_map.save()
+    except IntegrityError:
+        # Another request created it first
+        return SeatMap.objects.get(event=event)
+    return seat_map
+
+
+def seat_sections(seat_map):
+    """
+    Availability grouped by section and row for rendering.
+
+    Works straight off the bitmap: plain tuples, no per-seat model instances.
+    """
+    layout = SeatLayout(seat_map.layout)
+    bitmap = SeatBitmap(layout.size, seat_map.occupancy)
+    sections = []
+    for name, offset, seats, per_row in layout.sections:
+        rows = []
+        for row_start in range(0, seats, per_row):
+            seats_in_row = [
+                (layout.label(index), index in bitmap)
+                for index in range(offset + row_start, offset + min(row_start + per_row, seats))
+            ]
+            rows.append((row_label(row_start // per_row), seats_in_row))
+        sections.append({'name': name, 'rows': rows})
+    return sections
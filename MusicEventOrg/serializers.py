@@ -2,10 +2,46 @@ from django.contrib.auth.models import User
 from django.core.mail import send_mail
 from rest_framework import serializers
 
-from .models import Venue, Event, Ticket, Payment, Review, Performer, Festival
-
-
-class VenueSerializer(serializers.ModelSerializer):
+from . import images
+from .models import Venue, Event, EventForecast, Ticket, Payment, Review, Performer, Festival
+
+
+class SparseFieldsMixin:
+    """
+    Lets a serializer render only some of its fields, chosen with the `fields`
+    and `omit` arguments (the viewsets pass ?fields= / ?omit= through).
+
+    `field_sources` names the model fields behind computed fields, so the
+    view can limit the SELECT to the columns that end up in the response.
+    """
+    field_sources = {}
+
+    def __init__(self, *args, fields=None, omit=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        unknown = (set(fields or ()) | set(omit or ())) - set(self.fields)
+        if unknown:
+            raise serializers.ValidationError({'fields': f"Unknown field(s): {', '.join(sorted(unknown))}"})
+        keep = set(fields or self.fields) - set(omit or ())
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+    def model_field_names(self):
+        """Model fields read by the selected fields, or None if a computed field's sources are unknown."""
+        names = set()
+        for name, field in self.fields.items():
+            if field.write_only:
+                continue
+            if name in self.field_sources:
+                names.update(self.field_sources[name])
+            elif field.source == '*':
+                return None
+            else:
+                names.add(field.source.split('.')[0])
+        return names
+
+
+class VenueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Venue
         fields = '__all__'
@@ -15,24 +51,52 @@ def get_average_rating(obj):
     return obj.average_rating
 
 
-class EventSerializer(serializers.ModelSerializer):
+def expanded_fields(context):
+    """Relations the client asked to nest with ?expand=a,b."""
+    request = context.get('request')
+    if request is None:
+        return set()
+    return set(filter(None, request.query_params.get('expand', '').split(',')))
+
+
+def image_srcset(obj, context):
+    """{"webp": srcset, "jpeg": srcset} for the resized copies of the image, null until they are built."""
+    request = context.get('request')
+    sets = {fmt: images.srcset(obj, fmt, request) for fmt in images.FORMATS}
+    return sets if sets['jpeg'] else None
+
+
+class EventSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     average_rating = serializers.SerializerMethodField()
+    image_srcset = serializers.SerializerMethodField()
+    field_sources = {'average_rating': ['rating_sum', 'rating_count'], 'image_srcset': ['image', 'image_variants']}
 
     class Meta:
         model = Event
         fields = '__all__'
+        read_only_fields = ['rating_sum', 'rating_count', 'rating_1', 'rating_2', 'rating_3', 'rating_4', 'rating_5',
+                            'image_variants']
 
     def get_average_rating(self, obj):
         return obj.average_rating
 
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context)
+
+
+class PerformerSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    image_srcset = serializers.SerializerMethodField()
+    field_sources = {'image_srcset': ['image', 'image_variants']}
 
-class PerformerSerializer(serializers.ModelSerializer):
     class Meta:
         model = Performer
-        fields = ['id', 'name', 'bio', 'image', 'created_at', 'updated_at']
+        fields = ['id', 'name', 'bio', 'image', 'image_srcset', 'created_at', 'updated_at']
 
+    def get_image_srcset(self, obj):
+        return image_srcset(obj, self.context)
 
-class FestivalSerializer(serializers.ModelSerializer):
+
+class FestivalSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     organizer = serializers.StringRelatedField(read_only=True)  # Display organizer username
 
     class Meta:
@@ -42,33 +106,81 @@ class FestivalSerializer(serializers.ModelSerializer):
         read_only_fields = ['organizer']
 
 
-class TicketSerializer(serializers.ModelSerializer):
-    event = EventSerializer(read_only=True)
+class TicketSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    Tickets reference their event by id. With ?expand=event the full event
+    is nested instead; each distinct event is serialized once per response
+    and the result shared between its tickets.
+    """
+    qr_status = serializers.SerializerMethodField()
+    field_sources = {'qr_status': ['qr_code']}
 
     class Meta:
         model = Ticket
         fields = '__all__'
+        # price is locked from the event by book_ticket; the timestamps belong to the hold sweeper and the gates
+        read_only_fields = ['price', 'hold_expires_at', 'released_at', 'admitted_at']
+        validators = []  # seat uniqueness is enforced by book_ticket and the database constraint
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if 'event' in expanded_fields(self.context) and 'event' in data:
+            cache = self.context.setdefault('expanded_events', {})
+            if instance.event_id not in cache:
+                cache[instance.event_id] = EventSerializer(instance.event, context=self.context).data
+            data['event'] = cache[instance.event_id]
+        return data
+
+    def get_qr_status(self, obj):
+        # QR codes are rendered by the background workers after booking/payment
+        return 'ready' if obj.qr_code else 'pending'
 
     def validate(self, data):
-        event = data['event']
-        if event.available_seats <= 0:
+        event = data.get('event')
+        if event is not None and self.instance is None and event.available_seats <= 0:
             raise serializers.ValidationError("No seats available")
         return data
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class BulkTicketSerializer(serializers.Serializer):
+    MAX_TICKETS = 100
+
+    event = serializers.PrimaryKeyRelatedField(queryset=Event.objects.all())
+    user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), required=False, allow_null=True)
+    quantity = serializers.IntegerField(min_value=1, max_value=MAX_TICKETS, required=False)
+    seat_numbers = serializers.ListField(child=serializers.CharField(max_length=10), required=False,
+                                         max_length=MAX_TICKETS)
+    is_paid = serializers.BooleanField(default=False)
+
+    def validate(self, data):
+        seat_numbers = data.get('seat_numbers')
+        quantity = data.get('quantity')
+        if not seat_numbers and not quantity:
+            raise serializers.ValidationError("Provide either seat_numbers or quantity")
+        if seat_numbers and quantity and quantity != len(seat_numbers):
+            raise serializers.ValidationError("quantity does not match the number of seat_numbers")
+        return data
+
+
+class PaymentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Payment
         fields = '__all__'
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Review
         fields = ['id', 'user', 'event', 'rating', 'comment', 'created_at']
         read_only_fields = ['user']
 
 
+class EventForecastSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EventForecast
+        fields = ['event', 'daily_rate', 'projected_sellout_date', 'projected_attendance', 'computed_at']
+
+
 # class UserRegistrationSerializer(serializers.ModelSerializer):
 #     password = serializers.CharField(write_only=True)
 #     confirm_password = serializers.CharField(write_only=True)
@@ -0,0 +1,46 @@
+from uuid import uuid4
+
+from django.db import transaction
+from django.db.models.functions import Coalesce
+
+from . import counters, rollups
+from .jobs import enqueue_many
+from .models import Payment, Ticket
+
+CHUNK_SIZE = 1000
+
+
+def settle(tickets, payment_method, complimentary=False):
+    """
+    Mark the unpaid tickets among `tickets` as paid, give each a Payment and queue its QR code.
+
+    Work is done in chunks of CHUNK_SIZE tickets, each with a handful of bulk
+    queries in its own transaction; the QR codes are drawn by the job workers
+    (run_workers), so the request returns long before they are done.
+    Returns (tickets settled, job batch id for jobs.progress()).
+    """
+    batch = uuid4().hex
+    # Released holds no longer have a seat to sell; their customers check out again instead
+    ids = list(tickets.filter(is_paid=False, released_at__isnull=True).order_by().values_list('pk', flat=True))
+    settled = 0
+    for start in range(0, len(ids), CHUNK_SIZE):
+        with transaction.atomic():
+            rows = list(Ticket.objects.select_for_update(of=('self',))
+                        .filter(pk__in=ids[start:start + CHUNK_SIZE], is_paid=False, released_at__isnull=True)
+                        .values_list('pk', 'event_id', Coalesce('price', 'event__price'), 'payment__id'))
+            if not rows:
+                continue
+            Ticket.objects.filter(pk__in=[row[0] for row in rows]).update(is_paid=True, hold_expires_at=None)
+            # bulk_create() sends no post_save, so counters and rollups are updated here
+            payments = Payment.objects.bulk_create([
+                Payment(ticket_id=pk, amount=0 if complimentary else price, payment_method=payment_method,
+                        transaction_id=f'{payment_method}-{pk}')
+                for pk, event_id, price, payment_id in rows if payment_id is None
+            ])
+            events = {row[0]: row[1] for row in rows}
+            rollups.record_sales((payment.timestamp, events[payment.ticket_id], payment_method, payment.amount)
+                                 for payment in payments)
+            counters.bump('tickets_sold', len(rows))
+            enqueue_many('generate_qr_code', [{'ticket_id': row[0]} for row in rows], batch=batch)
+        settled += len(rows)
+    return settled, batch
@@ -0,0 +1,156 @@
+from django.db.models import QuerySet
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import counters, rollups
+from .caching import invalidate_events, invalidate_performers
+from .jobs import enqueue
+from .models import Event, Venue, Performer, Festival, Payment, Review, Ticket
+from .search import index_events
+
+
+@receiver(post_save, sender=Event)
+def reindex_event(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_events([instance.pk])
+
+
+@receiver(m2m_changed, sender=Event.performers.through)
+def reindex_event_performers(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        event_ids = [instance.pk]
+    elif pk_set:
+        # performer.events.add(...): the events are on the other side
+        event_ids = list(pk_set)
+    else:
+        enqueue('reindex_related', performer_id=instance.pk)
+        return
+    # The performer list is part of the event resource, invalidate its ETag
+    Event.objects.filter(pk__in=event_ids).update(updated_at=timezone.now())
+    invalidate_performers(event_ids)
+    index_events(event_ids)
+
+
+# Venues, performers and festivals can be shared by many events: reindex those in the background
+@receiver(post_save, sender=Venue)
+def reindex_venue_events(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        # Event pages show the venue name
+        Event.objects.filter(venue=instance).update(updated_at=timezone.now())
+        enqueue('reindex_related', venue_id=instance.pk)
+
+
+@receiver(post_save, sender=Performer)
+def reindex_performer_events(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        # Event pages list the performers by name
+        Event.objects.filter(performers=instance).update(updated_at=timezone.now())
+        enqueue('reindex_related', performer_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Performer)
+def touch_deleted_performer_events(sender, instance, **kwargs):
+    # Deleting the performer drops its event links without an m2m_changed signal
+    Event.objects.filter(performers=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Festival)
+def reindex_festival_events(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created:
+        enqueue('reindex_related', festival_id=instance.pk)
+
+
+# Template fragments rendered from these models (see MusicEventOrg/caching.py)
+@receiver([post_save, post_delete], sender=Event)
+def drop_event_fragments(sender, instance, **kwargs):
+    invalidate_events([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Review)
+def drop_reviewed_event_fragments(sender, instance, **kwargs):
+    invalidate_events([instance.event_id])
+
+
+@receiver(post_save, sender=Venue)
+def drop_venue_fragments(sender, instance, created, **kwargs):
+    # Deleting a venue deletes its events, which drop their own fragments
+    if not created:
+        invalidate_events(Event.objects.filter(venue=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Performer)
+def drop_performer_fragments(sender, instance, created, **kwargs):
+    invalidate_performers([] if created else instance.events.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Performer)
+def drop_deleted_performer_fragments(sender, instance, **kwargs):
+    # pre_delete: the performer's events are no longer linked by post_delete
+    invalidate_performers(instance.events.values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Performer)
+def queue_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw and instance.image and instance.image_variants.get('source') != instance.image.name:
+        enqueue('build_image_derivatives', model=sender._meta.model_name, pk=instance.pk)
+
+
+# Admin dashboard counters (see MusicEventOrg/counters.py). Tickets written in bulk without
+# signals (bulk booking, settlement) are counted by those paths.
+COUNTERS = {Event: 'events', Performer: 'performers', Festival: 'festivals'}
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_save, sender=Performer)
+@receiver(post_save, sender=Festival)
+def count_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump(COUNTERS[sender])
+
+
+@receiver(post_delete, sender=Event)
+@receiver(post_delete, sender=Performer)
+@receiver(post_delete, sender=Festival)
+def count_deleted(sender, instance, **kwargs):
+    counters.bump(COUNTERS[sender], -1)
+
+
+@receiver(pre_save, sender=Ticket)
+def note_paid_change(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Payments, admin edits and API updates can flip is_paid on an existing ticket: compare with the stored row
+    instance._paid_change = 0
+    if raw or instance._state.adding or (update_fields is not None and 'is_paid' not in update_fields):
+        return
+    was_paid = Ticket.objects.filter(pk=instance.pk).values_list('is_paid', flat=True).first()
+    if was_paid is not None:
+        instance._paid_change = int(instance.is_paid) - int(was_paid)
+
+
+@receiver(post_save, sender=Ticket)
+def count_paid_ticket(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        counters.bump('tickets_sold', int(instance.is_paid) if created else instance._paid_change)
+
+
+@receiver(post_delete, sender=Ticket)
+def uncount_paid_ticket(sender, instance, origin=None, **kwargs):
+    # Tickets deleted along with their event are taken off by uncount_event_tickets
+    deleting_events = isinstance(origin, Event) or (isinstance(origin, QuerySet) and origin.model is Event)
+    if instance.is_paid and not deleting_events:
+        counters.bump('tickets_sold', -1)
+
+
+@receiver(pre_delete, sender=Event)
+def uncount_event_tickets(sender, instance, **kwargs):
+    # One COUNT instead of a bump per cascaded ticket
+    counters.bump('tickets_sold', -Ticket.objects.filter(event=instance, is_paid=True).count())
+
+
+@receiver(post_save, sender=Payment)
+def roll_up_payment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        rollups.record_payment(instance)
@@ -1,14 +1,28 @@
 import requests
-from rest_framework_simplejwt import settings
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+_session = None
+
+
+def get_session():
+    """One pooled, keep-alive HTTP session per process for the SMS gateway."""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        _session.mount('http://', adapter)
+        _session.mount('https://', adapter)
+    return _session
 
 
 def send_sms(phone_number, message):
-    url = "http://api.sparrowsms.com/v2/sms/"
     payload = {
         'token': settings.SPARROW_SMS_TOKEN,
-        'from': 'YourCompany',
+        'from': settings.SPARROW_SMS_FROM,
         'to': phone_number,
         'text': message,
     }
-    response = requests.post(url, data=payload)
-    return response.json()
\ No newline at end of file
+    response = get_session().post(settings.SPARROW_SMS_URL, data=payload, timeout=settings.SPARROW_SMS_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
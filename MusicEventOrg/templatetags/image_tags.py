@@ -0,0 +1,11 @@
+from django import template
+
+from MusicEventOrg import images
+
+register = template.Library()
+
+
+@register.filter
+def srcset(instance, fmt='jpeg'):
+    """{{ event|srcset:"webp" }}: the resized copies of an event's or performer's image."""
+    return images.srcset(instance, fmt)
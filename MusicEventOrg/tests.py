@@ -1,3 +1,1086 @@
-from django.test import TestCase
+import base64
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib import import_module
+from io import BytesIO, StringIO
+import json
+import shutil
+import tempfile
+import threading
+from unittest import mock
+from urllib.parse import parse_qs
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.cache import cache, caches
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+from django.test.utils import CaptureQueriesContext
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+import requests
+from rest_framework.test import APITestCase
+
+from MusicEventOrg import (caching, checkin, counters, forecast, images, jobs, notifications, payments, pricing,
+                           ratings, rollups, views)
+from MusicEventOrg.admin import custom_admin_site
+from MusicEventOrg.booking import SeatUnavailable, SoldOut, book_ticket, book_tickets, release_expired_holds
+from MusicEventOrg.models import (Venue, Event, EventForecast, Ticket, Payment, Review, Performer, Festival, Job,
+                                  Notification, PriceHistory, SalesRollup, SearchDocument, SeatMap)
+from MusicEventOrg.payments import SEAT_GONE, WRONG_AMOUNT, EsewaPayment, PaypalPayment
+from MusicEventOrg.seatmap import SeatBitmap, SeatLayout, validate_layout
+from MusicEventOrg.ticket_tokens import InvalidToken, sign_ticket, verify_ticket_token
+from MusicEventOrg.utils import qr_thumbnail_name
+
+
+def create_admin():
+    return User.objects.create_superuser('admin', 'admin@example.com', 'admin123')
+
+
+def create_venue():
+    return Venue.objects.create(name='Venue', address='Thamel, Kathmandu')
+
+
+def create_event(venue, **fields):
+    """An upcoming 100-seat event at `venue` priced at 1000; `fields` override the defaults."""
+    fields = {'title': 'Event', 'description': '', 'date': timezone.now() + timedelta(days=1),
+              'price': 1000, 'total_seats': 100, 'available_seats': 100, **fields}
+    return Event.objects.create(venue=venue, **fields)
+
+
+class QueryBudgetTests(APITestCase):
+    """
+    Every router endpoint must run in a fixed number of queries, however many rows it returns.
+
+    Budgets include the COUNT(*) issued by page-number pagination; keyset
+    paginated endpoints (events, tickets, payments, reviews) don't count.
+    Events and festivals spend one query on their ETag fingerprint.
+    """
+
+    LIST_BUDGETS = {
+        'venue': 2,
+        'event': 3,  # fingerprint + page + performers prefetch
+        'ticket': 1,  # events are referenced by id unless expanded
+        'payment': 1,
+        'review': 1,
+        'performer': 2,
+        'festival': 3,  # fingerprint + count + page joined to organizer
+    }
+    DETAIL_BUDGETS = {
+        'venue': 1,
+        'event': 3,
+        'ticket': 1,
+        'payment': 1,
+        'review': 1,
+        'performer': 1,
+        'festival': 2,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        cls.performers = [Performer.objects.create(name=f'Performer {i}') for i in range(3)]
+        cls.counter = 0
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def add_rows(self, count):
+        """Add `count` rows to every table behind the router."""
+        for _ in range(count):
+            QueryBudgetTests.counter += 1
+            n = QueryBudgetTests.counter
+            venue = Venue.objects.create(name=f'Venue {n}', address='Thamel, Kathmandu')
+            festival = Festival.objects.create(
+                title=f'Festival {n}', description='', start_date=timezone.now().date(),
+                end_date=timezone.now().date(), venue=venue.name, organizer=self.admin,
+            )
+            event = Event.objects.create(
+                title=f'Event {n}', description='', date=timezone.now() + timedelta(days=n), venue=venue,
+                price=1000, total_seats=100, available_seats=100, festival=festival,
+            )
+            event.performers.add(*self.performers)
+            ticket = Ticket.objects.create(user=self.admin, event=event, seat_number='A1', is_paid=True)
+            Payment.objects.create(ticket=ticket, amount=1000, payment_method='esewa', transaction_id=f'txn-{n}')
+            Review.objects.create(user=self.admin, event=event, rating=4)
+            Performer.objects.create(name=f'Extra performer {n}')
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(queries)
+
+    def test_list_endpoints_have_a_fixed_query_budget(self):
+        self.add_rows(1)
+        small = {name: self.count_queries(reverse(f'{name}-list')) for name in self.LIST_BUDGETS}
+        self.add_rows(9)
+        for name, budget in self.LIST_BUDGETS.items():
+            with self.subTest(endpoint=name):
+                queries = self.count_queries(reverse(f'{name}-list'))
+                self.assertLessEqual(queries, budget)
+                self.assertEqual(queries, small[name], 'query count grows with the page size')
+
+    def test_detail_endpoints_have_a_fixed_query_budget(self):
+        self.add_rows(1)
+        objects = {
+            'venue': Venue.objects.first(),
+            'event': Event.objects.first(),
+            'ticket': Ticket.objects.first(),
+            'payment': Payment.objects.first(),
+            'review': Review.objects.first(),
+            'performer': Performer.objects.first(),
+            'festival': Festival.objects.first(),
+        }
+        for name, budget in self.DETAIL_BUDGETS.items():
+            with self.subTest(endpoint=name):
+                url = reverse(f'{name}-detail', args=[objects[name].pk])
+                self.assertLessEqual(self.count_queries(url), budget)
+
+    def test_expanded_ticket_list_has_a_fixed_query_budget(self):
+        # page joined to event + performers prefetch
+        self.add_rows(1)
+        small = self.count_queries(reverse('ticket-list') + '?expand=event')
+        self.add_rows(9)
+        self.assertEqual(self.count_queries(reverse('ticket-list') + '?expand=event'), small)
+        self.assertLessEqual(small, 2)
+
+    def test_keyset_pages_cover_every_row_once(self):
+        self.add_rows(25)
+        for ordering in ('date', '-price'):
+            with self.subTest(ordering=ordering):
+                seen, previous = [], None
+                url = reverse('event-list') + f'?ordering={ordering}&limit=10'
+                while url:
+                    page = self.client.get(url).json()
+                    seen += [event['id'] for event in page['results']]
+                    previous, url = page['previous'], page['next']
+                self.assertEqual(sorted(seen), sorted(Event.objects.values_list('pk', flat=True)))
+                self.assertEqual(len(seen), len(set(seen)))
+                # Walking back from the last page returns the page before it
+                back = self.client.get(previous).json()
+                self.assertEqual([event['id'] for event in back['results']], seen[10:20])
+
+    def test_malformed_cursors_are_not_found(self):
+        self.add_rows(1)
+        for cursor in ('not-base64!', {'v': 'soon', 'id': 1, 'd': 'n'}, {'v': None, 'id': 1, 'd': 'n'},
+                       {'v': '2026-01-01', 'id': 'one', 'd': 'n'}):
+            with self.subTest(cursor=cursor):
+                if isinstance(cursor, dict):
+                    cursor = base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+                response = self.client.get(reverse('event-list'), {'ordering': 'date', 'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+
+
+class BookingTests(TestCase):
+    def setUp(self):
+        self.event = create_event(create_venue(), total_seats=3, available_seats=3)
+
+    def assertSeats(self, available, tickets):
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.available_seats, Ticket.objects.filter(event=self.event).count()),
+                         (available, tickets))
+
+    def test_seat_count_stays_exact_down_to_sold_out(self):
+        book_ticket(self.event)
+        with self.assertRaises(SoldOut):
+            book_tickets(self.event, quantity=3)  # all or nothing
+        self.assertSeats(2, 1)
+        book_tickets(self.event, quantity=2)
+        self.assertSeats(0, 3)
+        with self.assertRaises(SoldOut):
+            book_ticket(self.event)
+        with self.assertRaises(SoldOut):
+            book_tickets(self.event, quantity=1)
+        self.assertSeats(0, 3)
+
+    def test_booking_page_holds_the_seat_and_goes_to_payment(self):
+        self.client.force_login(User.objects.create_user('fan', password='pw'))
+        response = self.client.post(reverse('ticket_booking', args=[self.event.pk]), follow=True)
+        ticket = Ticket.objects.get(event=self.event)
+        self.assertRedirects(response, reverse('payment', args=[ticket.pk]))
+        self.assertFalse(ticket.is_paid)
+        held_until = timezone.localtime(ticket.hold_expires_at).strftime('%H:%M')
+        self.assertContains(response, f'held until {held_until}')
+        self.assertContains(response, f'value="ticket_{ticket.pk}"')  # the eSewa form for this ticket
+
+
+class BulkBookingApiTests(APITestCase):
+    def setUp(self):
+        self.event = create_event(create_venue(), total_seats=10, available_seats=10)
+        self.client.force_authenticate(create_admin())
+
+    def bulk(self, **data):
+        return self.client.post(reverse('ticket-bulk'), {'event': self.event.pk, **data}, format='json')
+
+    def assertNothingBooked(self, response, available=10, tickets=0):
+        self.assertEqual(response.status_code, 400, response.content)
+        self.event.refresh_from_db()
+        self.assertEqual((self.event.available_seats, Ticket.objects.filter(event=self.event).count()),
+                         (available, tickets))
+
+    def test_books_every_seat_in_one_request(self):
+        response = self.bulk(seat_numbers=['A1', 'A2', 'A3'])
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(sorted(ticket['seat_number'] for ticket in response.json()), ['A1', 'A2', 'A3'])
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_seats, 7)
+
+    def test_one_taken_seat_books_nothing(self):
+        book_ticket(self.event, seat_number='A2')
+        self.assertNothingBooked(self.bulk(seat_numbers=['A1', 'A2', 'A3']), available=9, tickets=1)
+
+    def test_duplicate_seats_are_rejected(self):
+        self.assertNothingBooked(self.bulk(seat_numbers=['A1', 'A1']))
+
+    def test_quantity_must_match_the_seats(self):
+        self.assertNothingBooked(self.bulk(quantity=3, seat_numbers=['A1', 'A2']))
+        self.assertNothingBooked(self.bulk())
+
+    def test_at_most_100_tickets_per_request(self):
+        self.assertNothingBooked(self.bulk(quantity=101))
+        self.assertNothingBooked(self.bulk(seat_numbers=[f'A{n}' for n in range(101)]))
+
+
+class SeatMapTests(TestCase):
+    STANDS = [{'name': stand, 'seats': 1250, 'seats_per_row': 25} for stand in ('North', 'South')]
+
+    def setUp(self):
+        self.event = create_event(create_venue(), total_seats=40, available_seats=40)
+
+    def occupied(self):
+        seat_map = SeatMap.objects.get(event=self.event)
+        layout = SeatLayout(seat_map.layout)
+        bitmap = SeatBitmap(layout.size, seat_map.occupancy)
+        return {layout.label(index) for index in range(layout.size) if index in bitmap}
+
+    def test_bitmap_and_labels(self):
+        bitmap = SeatBitmap(20)
+        for index in (0, 7, 8, 19):
+            bitmap.add(index)
+        bitmap.discard(7)
+        self.assertEqual([index for index in range(20) if index in bitmap], [0, 8, 19])
+        self.assertEqual((bitmap.count(), len(bitmap.to_bytes())), (3, 3))
+
+        stands = SeatLayout(self.STANDS)
+        self.assertEqual(stands.label(1249), 'North-AX25')
+        self.assertEqual([stands.index(label) for label in ('North-A1', 'South-A1', 'North-AX25')], [0, 1250, 1249])
+        for label in ('A1', 'North-A26', 'North-AY1', 'East-A1', 'North-a1', 'North-A'):
+            self.assertIsNone(stands.index(label), label)
+        validate_layout(self.STANDS)
+        with self.assertRaises(ValidationError):
+            validate_layout([dict(stand, name=stand['name'] + 'ern') for stand in self.STANDS])  # 'Northern-AX25'
+        with self.assertRaises(ValidationError):
+            validate_layout([{'name': 'Main', 'seats': 10}])
+
+    def test_events_without_a_seat_map_still_sell_each_seat_once(self):
+        Ticket.objects.create(event=self.event, seat_number='A2', is_paid=True)  # sold before the map existed
+        book_ticket(self.event, seat_number='A1')
+        self.assertEqual(self.occupied(), {'A1', 'A2'})
+        for seats in (['A1'], ['A2'], ['B21'], ['C1'], ['B1', 'B1']):
+            with self.subTest(seats=seats), self.assertRaises(SeatUnavailable):
+                book_tickets(self.event, seat_numbers=seats)
+        book_tickets(self.event, seat_numbers=['B1', 'B2'])
+        self.assertEqual(self.occupied(), {'A1', 'A2', 'B1', 'B2'})
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_seats, 37)
+
+
+def paypal_payment(ticket, total):
+    """A stand-in for an approved paypalrestsdk.Payment for `ticket`."""
+    payment = mock.Mock(id='PAY-1')
+    payment.transactions = [mock.Mock()]
+    payment.transactions[0].item_list.items = [mock.Mock(sku=f'ticket_{ticket.pk}')]
+    payment.transactions[0].amount.total = total
+    return payment
+
+
+class PaymentHoldTests(TestCase):
+    def setUp(self):
+        self.event = create_event(create_venue(), total_seats=2, available_seats=2)
+        self.ticket = book_ticket(self.event, seat_number='A1')
+        Ticket.objects.filter(pk=self.ticket.pk).update(hold_expires_at=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(release_expired_holds(), 1)
+
+    def test_released_hold_is_kept_and_a_late_payment_takes_its_seat_back(self):
+        self.ticket.refresh_from_db()
+        self.assertIsNotNone(self.ticket.released_at)
+        with mock.patch('MusicEventOrg.payments.requests.post') as post:
+            post.return_value.text = 'Success'
+            result = EsewaPayment.verify_payment(f'ticket_{self.ticket.pk}', '1000.00', 'ref-1')
+        self.assertEqual(result['ticket_id'], self.ticket.pk)
+        self.ticket.refresh_from_db()
+        self.event.refresh_from_db()
+        self.assertEqual((self.ticket.is_paid, self.ticket.released_at), (True, None))
+        self.assertEqual(self.event.available_seats, 1)
+
+    def test_esewa_is_asked_before_the_ticket_is_locked(self):
+        oid = f'ticket_{self.ticket.pk}'
+        with mock.patch('MusicEventOrg.payments.lock_ticket', wraps=payments.lock_ticket) as lock, \
+                mock.patch('MusicEventOrg.payments.requests.post') as post:
+            post.side_effect = requests.Timeout('eSewa is slow')
+            self.assertEqual(EsewaPayment.verify_payment(oid, '1000', 'ref-1'),
+                             {'error': 'Payment verification failed'})
+            lock.assert_not_called()
+
+            def verify(*args, **kwargs):
+                self.assertFalse(lock.called)  # nothing is locked while eSewa answers
+                return mock.Mock(text='Success')
+            post.side_effect = verify
+            self.assertEqual(EsewaPayment.verify_payment(oid, '1000', 'ref-1')['ticket_id'], self.ticket.pk)
+        self.assertEqual(post.call_args.kwargs['timeout'], settings.ESEWA_VERIFY_TIMEOUT)
+        lock.assert_called_once_with(self.ticket.pk)
+
+    def test_paypal_does_not_charge_for_a_resold_seat(self):
+        book_ticket(self.event, seat_number='A1')  # the released seat is sold again
+        self.assertEqual(EsewaPayment.initiate_payment(self.ticket.pk), {'error': SEAT_GONE})
+        payment = paypal_payment(self.ticket, '1000.00')
+        with mock.patch('MusicEventOrg.payments.paypalrestsdk.Payment.find', return_value=payment):
+            self.assertEqual(PaypalPayment.verify_payment('PAY-1', 'payer'), {'error': SEAT_GONE})
+        payment.execute.assert_not_called()
+        self.event.refresh_from_db()
+        self.assertEqual(self.event.available_seats, 1)
+
+
+class PaymentAmountTests(TestCase):
+    def setUp(self):
+        self.event = create_event(create_venue())
+        self.ticket = book_ticket(self.event)
+        Event.objects.filter(pk=self.event.pk).update(price=1500)  # repriced after the seat was held
+
+    def test_esewa_amount_must_be_the_locked_price(self):
+        oid = f'ticket_{self.ticket.pk}'
+        with mock.patch('MusicEventOrg.payments.requests.post') as post:
+            post.return_value.text = 'Success'
+            self.assertEqual(EsewaPayment.verify_payment(oid, '1500', 'ref-1'), {'error': WRONG_AMOUNT})
+            for amount in ('abc', 'sNaN', 'Infinity', None):
+                with self.subTest(amount=amount):
+                    self.assertEqual(EsewaPayment.verify_payment(oid, amount, 'ref-1'),
+                                     {'error': 'Invalid payment amount'})
+            for bad_oid in ('ticket', 'ticket_', 'ticket_one', None):
+                with self.subTest(oid=bad_oid):
+                    self.assertEqual(EsewaPayment.verify_payment(bad_oid, '1000', 'ref-1'),
+                                     {'error': 'Invalid payment reference'})
+            post.assert_not_called()
+            self.assertEqual(EsewaPayment.verify_payment(oid, '1000.00', 'ref-1')['ticket_id'], self.ticket.pk)
+
+    def test_paypal_does_not_capture_a_different_amount(self):
+        payment = paypal_payment(self.ticket, '1500.00')
+        with mock.patch('MusicEventOrg.payments.paypalrestsdk.Payment.find', return_value=payment):
+            self.assertEqual(PaypalPayment.verify_payment('PAY-1', 'payer'), {'error': WRONG_AMOUNT})
+            payment.execute.assert_not_called()
+            payment.transactions[0].amount.total = '1000.00'
+            self.assertEqual(PaypalPayment.verify_payment('PAY-1', 'payer')['ticket_id'], self.ticket.pk)
+        self.ticket.refresh_from_db()
+        self.assertTrue(self.ticket.is_paid)
+
+
+@override_settings(TICKET_SIGNING_KEYS={'v1': 'first key', 'v2': 'second key'}, TICKET_SIGNING_KEY_ID='v1')
+class TicketTokenTests(TestCase):
+    def setUp(self):
+        self.event = create_event(create_venue())
+        self.ticket = book_ticket(self.event, seat_number='A1', is_paid=True)
+
+    def assertRejected(self, token, message, **kwargs):
+        with self.assertRaisesMessage(InvalidToken, message):
+            verify_ticket_token(token, **kwargs)
+
+    def test_valid_token_carries_the_ticket(self):
+        claims = verify_ticket_token(sign_ticket(self.ticket))
+        self.assertEqual((claims.event_id, claims.ticket_id, claims.seat_number, claims.key_id),
+                         (self.event.pk, self.ticket.pk, 'A1', 'v1'))
+
+    def test_forged_and_malformed_tokens_are_rejected(self):
+        key_id, payload, signature = sign_ticket(self.ticket).split('.')
+        other = book_ticket(self.event, seat_number='A2', is_paid=True)
+        forged_payload = sign_ticket(other).split('.')[1]
+        self.assertRejected(f'{key_id}.{forged_payload}.{signature}', 'Bad signature')
+        self.assertRejected(f'{key_id}.{payload}.{signature[:-2]}', 'Bad signature')
+        self.assertRejected(f'v9.{payload}.{signature}', 'Malformed token')  # unknown key id
+        for token in ('', 'garbage', f'{key_id}.{payload}', f'{key_id}.{payload}.{signature}.extra', None):
+            with self.subTest(token=token):
+                self.assertRejected(token, 'Malformed token')
+
+    def test_tokens_expire_after_the_grace_period(self):
+        token = sign_ticket(self.ticket)
+        expires_at = verify_ticket_token(token).expires_at
+        verify_ticket_token(token, now=expires_at)
+        self.assertRejected(token, 'Ticket has expired', now=expires_at + 1)
+
+    def test_tokens_signed_before_a_rotation_stay_valid_until_the_key_is_retired(self):
+        old = sign_ticket(self.ticket)
+        with self.settings(TICKET_SIGNING_KEY_ID='v2'):
+            self.assertEqual(sign_ticket(self.ticket).split('.')[0], 'v2')
+            self.assertEqual(verify_ticket_token(old).key_id, 'v1')
+        with self.settings(TICKET_SIGNING_KEYS={'v2': 'second key'}, TICKET_SIGNING_KEY_ID='v2'):
+            self.assertRejected(old, 'Malformed token')
+
+
+@override_settings(CHECKIN_FLUSH_SIZE=200, CHECKIN_FLUSH_SECONDS=3600)
+class CheckInTests(APITestCase):
+    def setUp(self):
+        self.registry = checkin.AdmissionRegistry()
+        self.enterContext(mock.patch.object(checkin, 'registry', self.registry))
+        self.enterContext(mock.patch.object(checkin.AdmissionRegistry, 'start_writer'))  # flushed by hand here
+        self.event = create_event(create_venue())
+        self.tokens = [sign_ticket(ticket) for ticket in book_tickets(self.event, quantity=3, is_paid=True)]
+        self.client.force_authenticate(create_admin())
+
+    def scan(self, token):
+        return self.client.post(reverse('scan_qr_code'), {'token': token, 'event_id': self.event.pk})
+
+    def admitted(self):
+        return Ticket.objects.filter(admitted_at__isnull=False).count()
+
+    def test_second_scan_is_a_duplicate_before_and_after_the_write_back(self):
+        self.assertEqual(self.scan(self.tokens[0]).status_code, 200)
+        self.assertEqual(self.scan(self.tokens[0]).status_code, 409)
+        self.assertEqual(self.admitted(), 0)  # still buffered
+        self.assertEqual(self.registry.maybe_flush(force=True), 1)
+        self.assertEqual(self.admitted(), 1)
+        # A restarted process loads the admissions back from the database
+        with mock.patch.object(checkin, 'registry', checkin.AdmissionRegistry()):
+            self.assertEqual(self.scan(self.tokens[0]).status_code, 409)
+
+    def test_batch_scan_reports_each_token(self):
+        other = create_event(self.event.venue, title='Other')
+        wrong_event = sign_ticket(book_ticket(other, is_paid=True))
+        response = self.client.post(reverse('scan_qr_code_batch'), {
+            'tokens': [self.tokens[0], self.tokens[1], self.tokens[0], 'garbage', wrong_event],
+            'event_id': self.event.pk,
+        }, format='json')
+        self.assertEqual(response.json()['admitted'], 2)
+        self.assertEqual([result['status'] for result in response.json()['results']],
+                         [checkin.ADMITTED, checkin.ADMITTED, checkin.DUPLICATE, checkin.INVALID, checkin.WRONG_EVENT])
+
+    def test_failed_write_back_does_not_fail_the_scan(self):
+        self.scan(self.tokens[0])
+        with override_settings(CHECKIN_FLUSH_SIZE=1), self.assertLogs('MusicEventOrg.checkin', 'ERROR'), \
+                mock.patch('django.db.models.QuerySet.update', side_effect=DatabaseError('database is down')):
+            self.assertEqual(self.scan(self.tokens[1]).status_code, 200)
+        self.assertEqual(self.scan(self.tokens[1]).status_code, 409)
+        self.assertEqual(self.registry.maybe_flush(force=True), 2)  # kept for the next attempt
+        self.assertEqual(self.admitted(), 2)
+
+    def test_scanning_by_ticket_id_admits_once(self):
+        ticket = Ticket.objects.filter(event=self.event).first()
+        url = reverse('qr_code', args=[ticket.pk])
+        self.assertEqual(self.client.post(url, {'event_id': self.event.pk}).status_code, 200)
+        self.assertEqual(self.client.post(url, {'event_id': self.event.pk}).status_code, 409)
+        self.assertEqual(self.registry.maybe_flush(force=True), 1)
+
+    def test_sign_up_and_login_stay_open(self):
+        factory = RequestFactory()
+        credentials = {'username': 'fan', 'email': 'fan@example.com', 'password': 'pw-12345678',
+                       'confirm_password': 'pw-12345678'}
+        response = views.api_register(factory.post('/', credentials, content_type='application/json'))
+        self.assertEqual(response.status_code, 201, response.data)
+        response = views.api_login(factory.post('/', {'username': 'fan', 'password': 'pw-12345678'},
+                                                content_type='application/json'))
+        self.assertEqual(response.status_code, 200, response.data)
+
+    def test_only_staff_can_scan(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.scan(self.tokens[0]).status_code, 401)
+        self.client.force_authenticate(User.objects.create_user('fan', password='pw'))
+        self.assertEqual(self.scan(self.tokens[0]).status_code, 403)
+        response = self.client.post(reverse('scan_qr_code_batch'), {'tokens': self.tokens}, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.registry.maybe_flush(force=True), 0)
+
+
+class RatingTests(APITestCase):
+    def setUp(self):
+        self.admin = create_admin()
+        self.event = create_event(create_venue())
+
+    def aggregates(self):
+        self.event.refresh_from_db()
+        return {field: getattr(self.event, field) for field in ('rating_count', 'rating_sum', 'rating_2', 'rating_4')}
+
+    def assertAggregates(self, count, total, twos, fours):
+        self.assertEqual(self.aggregates(),
+                         {'rating_count': count, 'rating_sum': total, 'rating_2': twos, 'rating_4': fours})
+
+    def test_api_edits_and_deletes_update_the_aggregates(self):
+        self.client.force_authenticate(User.objects.create_user('fan', password='pw'))
+        response = self.client.post(reverse('review-list'), {'event': self.event.pk, 'rating': 4})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertAggregates(1, 4, 0, 1)
+        url = reverse('review-detail', args=[response.json()['id']])
+        self.assertEqual(self.client.patch(url, {'rating': 2}).status_code, 200)
+        self.assertAggregates(1, 2, 1, 0)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertAggregates(0, 0, 0, 0)
+
+    def test_admin_edits_and_deletes_update_the_aggregates(self):
+        review = Review.objects.create(user=self.admin, event=self.event, rating=4)
+        ratings.review_added(review)
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('custom_admin:MusicEventOrg_review_change', args=[review.pk]),
+                                    {'user': self.admin.pk, 'event': self.event.pk, 'rating': 2, 'comment': ''})
+        self.assertEqual(response.status_code, 302)
+        self.assertAggregates(1, 2, 1, 0)
+        self.client.post(reverse('custom_admin:MusicEventOrg_review_delete', args=[review.pk]), {'post': 'yes'})
+        self.assertFalse(Review.objects.exists())
+        self.assertAggregates(0, 0, 0, 0)
+
+    def test_rebuild_ratings_recomputes_from_the_reviews(self):
+        other = create_event(self.event.venue, title='Other')
+        for rating in (2, 4, 4):
+            Review.objects.create(user=self.admin, event=self.event, rating=rating)
+        Event.objects.filter(pk=self.event.pk).update(rating_count=7, rating_sum=1, rating_4=9)
+        Event.objects.filter(pk=other.pk).update(rating_count=3, rating_sum=12)  # its reviews are gone
+        call_command('rebuild_ratings', stdout=StringIO())
+        self.assertAggregates(3, 10, 1, 2)
+        other.refresh_from_db()
+        self.assertEqual((other.rating_count, other.rating_sum), (0, 0))
+
+
+class SearchTests(APITestCase):
+    def setUp(self):
+        self.rock = create_event(create_venue(), title='Rock night', description='Loud guitars')
+        cellar = Venue.objects.create(name='Jazz Cellar', address='Patan')
+        self.jazz = create_event(cellar, title='Evening session', description='Standards and a late jam')
+        self.band = Performer.objects.create(name='Kutumba')
+        self.rock.performers.add(self.band)
+
+    def search(self, query):
+        response = self.client.get(reverse('event-list'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [event['id'] for event in response.json()['results']]
+
+    def test_matches_performers_and_venues(self):
+        self.assertEqual(self.search('kutumba'), [self.rock.pk])
+        self.assertEqual(self.search('cellar'), [self.jazz.pk])
+        self.assertEqual(self.search('Thamel'), [self.rock.pk])
+        self.assertEqual(self.search('night jam'), [])  # every term must match the same event
+        self.assertEqual(self.search('ROCK kutumba'), [self.rock.pk])
+
+    def test_ranks_title_matches_first(self):
+        late = create_event(self.jazz.venue, title='Late show', description='')
+        self.assertEqual(self.search('late'), [late.pk, self.jazz.pk])
+
+    def test_performer_edit_reindexes_its_events(self):
+        self.band.name = 'Sabin Rai'
+        self.band.save()
+        while jobs.work():
+            pass
+        self.assertEqual(self.search('sabin'), [self.rock.pk])
+        self.assertEqual(self.search('kutumba'), [])
+
+    def test_migration_indexes_existing_events(self):
+        backfill = import_module('MusicEventOrg.migrations.0023_backfill_search_index').backfill_search_index
+        SearchDocument.objects.all().delete()
+        self.assertEqual(self.search('kutumba'), [])
+        backfill(django_apps, mock.Mock(connection=connection))
+        self.assertEqual(self.search('kutumba'), [self.rock.pk])
+        self.assertEqual(self.search('cellar'), [self.jazz.pk])
+
+
+class ConditionalGetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        venue = create_venue()
+        cls.event = create_event(venue)
+
+    def assertRevalidates(self, url, change):
+        response = self.client.get(url)
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        change()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_event_detail_revalidates_after_booking(self):
+        self.assertRevalidates(reverse('event-detail', args=[self.event.pk]), lambda: book_ticket(self.event))
+
+    def test_event_page_revalidates_after_performer_rename(self):
+        performer = Performer.objects.create(name='Band')
+        self.event.performers.add(performer)
+
+        def rename():
+            performer.name = 'Renamed band'
+            performer.save()
+        self.assertRevalidates(reverse('event_details', args=[self.event.pk]), rename)
+
+    def test_event_list_revalidates_after_rating(self):
+        user = User.objects.create_user('fan')
+        self.assertRevalidates(
+            reverse('event-list'),
+            lambda: ratings.review_added(Review.objects.create(user=user, event=self.event, rating=5)),
+        )
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        caches[caching.FRAGMENTS].clear()
+        self.venue = create_venue()
+        self.event = create_event(self.venue)
+
+    def test_home_is_served_from_the_cache_until_an_event_changes(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            self.assertContains(self.client.get(reverse('home')), 'Event')
+        self.event.title = 'Renamed'
+        self.event.save()
+        self.assertContains(self.client.get(reverse('home')), 'Renamed')
+
+    def test_venue_change_invalidates_event_cards(self):
+        self.client.get(reverse('home'))
+        self.venue.name = 'New venue'
+        self.venue.save()
+        self.assertContains(self.client.get(reverse('home')), 'New venue')
+
+    def test_performer_change_invalidates_lineups(self):
+        performer = Performer.objects.create(name='Band')
+        self.event.performers.add(performer)
+        url = reverse('event_details', args=[self.event.pk])
+        self.assertContains(self.client.get(url), 'Band')
+        performer.name = 'Renamed band'
+        performer.save()
+        self.assertContains(self.client.get(url), 'Renamed band')
+
+    def test_performers_page_counts_upcoming_events(self):
+        performer = Performer.objects.create(name='Band')
+        self.event.performers.add(performer)
+        self.assertContains(self.client.get(reverse('performers')), '1 upcoming event')
+        create_event(self.venue, title='Past', date=timezone.now() - timedelta(days=1)).performers.add(performer)
+        second = create_event(self.venue, title='Later', date=timezone.now() + timedelta(days=2))
+        second.performers.add(performer)
+        self.assertContains(self.client.get(reverse('performers')), '2 upcoming events')
+
+
+class SparseFieldsetTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        venue = create_venue()
+        for n in range(20):
+            create_event(venue, title=f'Event {n}', description='Long description ' * 20,
+                         date=timezone.now() + timedelta(days=n), price=1000 + n)
+
+    def test_fields_limits_response_and_select_list(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('event-list') + '?fields=id,title,price&ordering=price')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'title', 'price'})
+        page_query = queries.captured_queries[-1]['sql']
+        self.assertNotIn('description', page_query)
+
+    def test_omit_and_unknown_fields(self):
+        response = self.client.get(reverse('event-list') + '?omit=description')
+        self.assertNotIn('description', response.json()['results'][0])
+        self.assertEqual(self.client.get(reverse('event-list') + '?fields=nope').status_code, 400)
+
+    def test_tickets_expand_their_event_on_request(self):
+        ticket = book_ticket(Event.objects.first(), is_paid=True)
+        [plain] = self.client.get(reverse('ticket-list')).json()['results']
+        self.assertEqual(plain['event'], ticket.event_id)
+        [expanded] = self.client.get(reverse('ticket-list') + '?expand=event').json()['results']
+        self.assertEqual(expanded['event']['title'], ticket.event.title)
+        [sparse] = self.client.get(reverse('ticket-list') + '?expand=event&fields=id,event').json()['results']
+        self.assertEqual(set(sparse), {'id', 'event'})
+        self.assertEqual(sparse['event']['id'], ticket.event_id)
+
+    def test_ticket_timestamps_are_read_only(self):
+        ticket = book_ticket(Event.objects.first())
+        self.client.force_authenticate(create_admin())
+        response = self.client.patch(reverse('ticket-detail', args=[ticket.pk]), {
+            'hold_expires_at': None, 'released_at': timezone.now(), 'admitted_at': timezone.now(),
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(Ticket.objects.values_list('hold_expires_at', 'released_at', 'admitted_at').get(pk=ticket.pk),
+                         (ticket.hold_expires_at, None, None))
+
+    def test_large_responses_are_compressed(self):
+        response = self.client.get(reverse('event-list') + '?limit=20', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertIn(response['Content-Encoding'], ('gzip', 'br'))
+        small = self.client.get(reverse('event-list') + '?fields=id&limit=1', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertFalse(small.has_header('Content-Encoding'))
+        # HTML carries CSRF tokens and is never compressed (BREACH)
+        page = self.client.get(reverse('event-list') + '?limit=20&format=api', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(page['Content-Type'].split(';')[0], 'text/html')
+        self.assertFalse(page.has_header('Content-Encoding'))
+
+
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+
+    def test_upload_builds_resized_copies(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (1000, 500), (200, 0, 0, 128)).save(buffer, 'PNG')
+        performer = Performer.objects.create(name='Band', image=SimpleUploadedFile('band.png', buffer.getvalue()))
+        job = Job.objects.get(kind='build_image_derivatives')
+        jobs.run(job)
+
+        performer.refresh_from_db()
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(performer.image_variants, {'source': performer.image.name, 'widths': [320, 640]})
+        self.assertIn('-640w.webp 640w', images.srcset(performer, 'webp'))
+        with default_storage.open(images.derivative_name(performer.image.name, 320, 'jpeg')) as copy:
+            self.assertEqual(Image.open(copy).size, (320, 160))
+
+
+@override_settings(JOB_MAX_ATTEMPTS=2)
+class JobLeaseTests(TestCase):
+    def expire_leases(self):
+        Job.objects.filter(status=Job.RUNNING).update(run_after=timezone.now() - timedelta(seconds=1))
+
+    def test_jobs_of_a_dead_worker_are_claimed_again_then_failed(self):
+        job = jobs.enqueue('reindex_related', performer_id=1)
+        self.assertEqual([claimed.pk for claimed in jobs.claim()], [job.pk])
+        self.assertEqual(jobs.claim(), [])  # leased to the first worker
+        self.expire_leases()  # ...which died without recording the outcome
+        self.assertEqual([claimed.attempts for claimed in jobs.claim()], [2])
+        self.expire_leases()
+        self.assertEqual(jobs.claim(), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+
+class SmsGateway(BaseHTTPRequestHandler):
+    """Stands in for the SMS gateway: accepts every number except FAILING_NUMBER."""
+    FAILING_NUMBER = '9800000000'
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real gateway
+    received = []
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        self.received.append(form['to'][0])
+        code = 500 if form['to'][0] == self.FAILING_NUMBER else 200
+        body = json.dumps({'response_code': code}).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@override_settings(NOTIFICATION_MAX_ATTEMPTS=2, NOTIFICATION_RETRY_BASE_SECONDS=30)
+class NotificationDispatchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        server = ThreadingHTTPServer(('127.0.0.1', 0), SmsGateway)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(server.server_close)
+        cls.addClassCleanup(server.shutdown)
+        cls.enterClassContext(override_settings(
+            SPARROW_SMS_URL=f'http://127.0.0.1:{server.server_port}/v2/sms/',
+            EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+        ))
+
+    def setUp(self):
+        SmsGateway.received.clear()
+
+    def test_sms_is_sent_and_failures_are_retried_with_backoff(self):
+        sent = notifications.queue_sms('9811111111', 'Your ticket is booked')
+        failing = notifications.queue_sms(SmsGateway.FAILING_NUMBER, 'Your ticket is booked')
+        with self.assertLogs('MusicEventOrg.notifications', 'WARNING'):
+            self.assertEqual(notifications.dispatch(), 2)
+        self.assertEqual(sorted(SmsGateway.received), sorted([sent.recipient, failing.recipient]))
+        sent.refresh_from_db()
+        failing.refresh_from_db()
+        self.assertEqual(sent.status, Notification.SENT)
+        self.assertEqual((failing.status, failing.attempts), (Notification.PENDING, 1))
+        self.assertIn('500', failing.last_error)
+        backoff = (failing.next_attempt_at - timezone.now()).total_seconds()
+        self.assertTrue(25 < backoff <= 30, backoff)
+        self.assertEqual(notifications.dispatch(), 0)  # not due yet
+
+        # The last attempt gives up
+        Notification.objects.filter(pk=failing.pk).update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        with self.assertLogs('MusicEventOrg.notifications', 'WARNING'):
+            self.assertEqual(notifications.dispatch(), 1)
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (Notification.FAILED, 2))
+
+    def test_emails_share_one_connection(self):
+        for n in range(3):
+            notifications.queue_email(f'fan{n}@example.com', 'Your ticket', 'See you there')
+        with mock.patch('MusicEventOrg.notifications.get_connection', wraps=notifications.get_connection) as connect:
+            self.assertEqual(notifications.dispatch(), 3)
+        self.assertEqual(connect.call_count, 1)
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox),
+                         [f'fan{n}@example.com' for n in range(3)])
+        self.assertFalse(Notification.objects.exclude(status=Notification.SENT).exists())
+
+
+class SiteCounterTests(TestCase):
+    def setUp(self):
+        cache.delete(counters.CACHE_KEY)
+        self.admin = create_admin()
+        self.venue = create_venue()
+
+    def admin_context(self):
+        request = RequestFactory().get('/custom-admin/')
+        request.user = self.admin
+        return custom_admin_site.each_context(request)
+
+    def test_admin_pages_read_cached_counters(self):
+        self.admin_context()
+        with self.assertNumQueries(0):
+            self.admin_context()
+
+    def test_counters_follow_bookings(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = create_event(self.venue)
+        with self.captureOnCommitCallbacks(execute=True):
+            book_ticket(event, user=self.admin, is_paid=True)
+            book_tickets(event, quantity=3, is_paid=True)
+            book_ticket(event, user=self.admin)  # unpaid hold
+        context = self.admin_context()
+        self.assertEqual((context['total_events'], context['total_tickets_sold']), (1, 4))
+        self.assertEqual(counters.reconcile(), counters.values())
+
+    def test_counters_follow_paid_changes_and_deletions(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            event = create_event(self.venue)
+            held, paid = book_ticket(event), book_ticket(event, is_paid=True)
+        self.client.force_login(self.admin)
+        url = reverse('custom_admin:MusicEventOrg_ticket_change', args=[paid.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            # Unticked in the admin change form...
+            response = self.client.post(url, {'event': event.pk, 'seat_number': '', 'price': '1000.00'})
+            self.assertEqual(response.status_code, 302)
+            # ...and set through the API
+            response = self.client.patch(f'/api/tickets/{held.pk}/', {'is_paid': True}, content_type='application/json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(counters.values()['tickets_sold'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            Ticket.objects.get(pk=held.pk).delete()
+        self.assertEqual(counters.values()['tickets_sold'], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            book_tickets(event, quantity=2, is_paid=True)
+            event.delete()  # its tickets come off once, not once per cascaded ticket
+        self.assertEqual(counters.values(), counters.reconcile())
+
+
+class SalesRollupTests(TestCase):
+    def setUp(self):
+        self.admin = create_admin()
+        venue = create_venue()
+        self.event = create_event(venue)
+
+    def pay(self, method, amount):
+        ticket = book_ticket(self.event, user=self.admin, is_paid=True)
+        Payment.objects.create(ticket=ticket, amount=amount, payment_method=method, transaction_id=f'txn-{ticket.pk}')
+
+    def test_payments_update_rollups_and_charts_read_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pay('esewa', '1000.00')  # gateways hand over the amount as a string
+            self.pay('esewa', 1000)
+            self.pay('paypal', 1000)
+        built = list(SalesRollup.objects.values_list('payment_method', 'tickets', 'revenue').order_by('payment_method'))
+        self.assertEqual(built, [('esewa', 2, 2000), ('paypal', 1, 1000)])
+        rollups.rebuild()
+        rebuilt = list(SalesRollup.objects.values_list('payment_method', 'tickets', 'revenue').order_by('payment_method'))
+        self.assertEqual(rebuilt, built)
+
+        self.client.force_login(self.admin)
+        with self.assertNumQueries(3):  # session, user, rollup rows
+            data = self.client.get(reverse('sales_chart'), {'metric': 'revenue', 'group': 'payment_method', 'days': 7}).json()
+        self.assertEqual(len(data['labels']), 7)
+        self.assertEqual({dataset['label']: dataset['data'][-1] for dataset in data['datasets']},
+                         {'esewa': 2000.0, 'paypal': 1000.0})
+        self.assertEqual(self.client.get(reverse('sales_chart'), {'metric': 'seats'}).status_code, 400)
+
+
+class ExportTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_admin()
+        venue = create_venue()
+        cls.events = [create_event(venue, title=f'Event {n}', date=timezone.now() + timedelta(days=n + 1))
+                      for n in range(2)]
+        for event in cls.events:
+            for method in ('esewa', 'paypal'):
+                ticket = book_ticket(event, user=cls.admin, is_paid=True)
+                Payment.objects.create(ticket=ticket, amount=1000, payment_method=method,
+                                       transaction_id=f'txn-{ticket.pk}')
+            book_ticket(event, user=cls.admin)  # unpaid hold
+
+    def setUp(self):
+        self.client.force_authenticate(self.admin)
+
+    def download(self, url, **params):
+        response = self.client.get(url, params)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_exports_stream_filtered_rows(self):
+        body = self.download('/api/tickets/export/', event=self.events[0].pk)
+        self.assertEqual(len(body.splitlines()), 4)  # header + 3 tickets
+        body = self.download('/api/tickets/attendees/', payment_method='paypal')
+        self.assertEqual(len(body.splitlines()), 3)
+        body = self.download('/api/payments/export/', output='jsonl', date_from=timezone.localdate().isoformat())
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[0]['venue'], 'Venue')
+
+    def test_exports_are_for_admins_and_validate_filters(self):
+        self.assertEqual(self.client.get('/api/tickets/export/', {'date_to': 'soon'}).status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get('/api/payments/export/').status_code, (401, 403))
+
+
+class SettlementTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()  # the QR jobs write their PNGs here
+        self.addCleanup(shutil.rmtree, media)
+        self.enterContext(override_settings(MEDIA_ROOT=media))
+        cache.delete(counters.CACHE_KEY)
+        self.admin = create_admin()
+        venue = create_venue()
+        self.event = create_event(venue)
+
+    def test_bulk_settlement_creates_payments_and_queues_qr_codes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            held = book_tickets(self.event, quantity=5)
+            book_ticket(self.event, user=self.admin, is_paid=True)
+        self.client.force_login(self.admin)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('custom_admin:MusicEventOrg_ticket_changelist'), {
+                'action': 'mark_as_complimentary', '_selected_action': [t.pk for t in Ticket.objects.all()],
+            }, follow=True)
+        self.assertContains(response, '5 tickets marked as paid')
+        self.assertEqual(Payment.objects.filter(payment_method='comp', amount=0).count(), 5)
+        self.assertEqual(counters.values()['tickets_sold'], 6)
+        self.assertEqual(SalesRollup.objects.get(payment_method='comp').tickets, 5)
+
+        batch = Job.objects.filter(kind='generate_qr_code').exclude(batch='').values_list('batch', flat=True)[0]
+        self.assertEqual(jobs.progress(batch)['pending'], 5)
+        while jobs.work():
+            pass
+        self.assertTrue(all(ticket.qr_code for ticket in Ticket.objects.filter(pk__in=[t.pk for t in held])))
+        response = self.client.get(reverse('custom_admin:MusicEventOrg_ticket_settlement', args=[batch]))
+        self.assertContains(response, '5 of 5 QR codes processed')
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.admin = create_admin()
+        venue = create_venue()
+        self.event = create_event(venue)
+        self.client.force_login(self.admin)
+
+    def changelist(self, model, **params):
+        url = reverse(f'custom_admin:MusicEventOrg_{model}_changelist')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        for n in range(3):
+            ticket = book_ticket(self.event, user=self.admin, is_paid=True)
+            Payment.objects.create(ticket=ticket, amount=1000, payment_method='esewa', transaction_id=f'txn-{n}')
+        self.changelist('ticket')  # warm the dashboard counters cache
+        budgets = {model: self.changelist(model)[1] for model in ('ticket', 'payment')}
+        for n in range(3, 10):
+            ticket = book_ticket(self.event, user=self.admin, is_paid=True)
+            Payment.objects.create(ticket=ticket, amount=1000, payment_method='esewa', transaction_id=f'txn-{n}')
+        self.assertEqual({model: self.changelist(model)[1] for model in ('ticket', 'payment')}, budgets)
+
+    def test_event_filter_and_qr_thumbnails(self):
+        other = create_event(self.event.venue, title='Other', date=timezone.now() - timedelta(days=1))
+        with override_settings(MEDIA_ROOT=self.media):
+            ticket = book_ticket(other, user=self.admin, is_paid=True)
+            jobs.run(jobs.enqueue('generate_qr_code', ticket_id=ticket.pk))
+            ticket.refresh_from_db()
+            thumbnail = qr_thumbnail_name(ticket.qr_code.name)
+            self.assertLess(default_storage.size(thumbnail), default_storage.size(ticket.qr_code.name))
+            with default_storage.open(thumbnail) as image:
+                self.assertEqual(Image.open(image).mode, '1')
+            response, _ = self.changelist('ticket', event=other.pk)
+        self.assertContains(response, qr_thumbnail_name(ticket.qr_code.name))
+        self.assertEqual(response.context['cl'].result_count, 1)
+        self.assertContains(response, '>Other</a>')  # past event offered because it is selected
+
+
+class ForecastTests(APITestCase):
+    def setUp(self):
+        self.admin = create_admin()
+        venue = create_venue()
+        today = timezone.localdate()
+        self.events = [create_event(venue, title=f'Event {n}', date=timezone.now() + timedelta(days=30),
+                                    available_seats=available, created_at=timezone.now() - timedelta(days=10))
+                       for n, available in enumerate((80, 90, 0))]
+        # 10 tickets a day for the first event, 1 a day for the second, none recorded for the sold-out one
+        SalesRollup.objects.bulk_create(
+            [SalesRollup(day=today - timedelta(days=d), event=self.events[0], payment_method='esewa',
+                         tickets=10, revenue=10000) for d in range(11)]
+            + [SalesRollup(day=today - timedelta(days=d), event=self.events[1], payment_method='esewa',
+                           tickets=1, revenue=1000) for d in range(11)]
+        )
+
+    def test_forecasts_project_sellout_and_attendance(self):
+        with self.assertNumQueries(3):  # events, daily sales, upsert
+            self.assertEqual(forecast.update_forecasts(), 3)
+        fast, slow, sold_out = (EventForecast.objects.get(event=event) for event in self.events)
+        today = timezone.localdate()
+        self.assertEqual(fast.projected_attendance, 100)
+        self.assertEqual(fast.projected_sellout_date, today + timedelta(days=8))
+        self.assertEqual((slow.projected_sellout_date, slow.projected_attendance), (None, 40))
+        self.assertEqual((sold_out.projected_sellout_date, sold_out.projected_attendance), (today, 100))
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(f'/api/events/{self.events[1].pk}/forecast/')
+        self.assertEqual(response.json()['projected_attendance'], 40)
+        self.assertEqual(len(self.client.get('/api/events/forecasts/').json()['results']), 3)
+
+
+class PricingTests(TestCase):
+    def setUp(self):
+        self.admin = create_admin()
+        venue = create_venue()
+        today = timezone.localdate()
+        created = timezone.now() - timedelta(days=30)
+        self.hot, self.cold, self.new = (create_event(
+            venue, title=title, date=timezone.now() + timedelta(days=10), available_seats=50,
+            created_at=created if title != 'New' else timezone.now(),
+        ) for title in ('Hot', 'Cold', 'New'))
+        # 20 a day for the hot event (200 wanted for 50 seats), 1 a day for the cold one (10 for 50)
+        SalesRollup.objects.bulk_create(
+            [SalesRollup(day=today - timedelta(days=d), event=self.hot, payment_method='esewa', tickets=20,
+                         revenue=20000) for d in range(7)]
+            + [SalesRollup(day=today - timedelta(days=d), event=self.cold, payment_method='esewa', tickets=1,
+                           revenue=1000) for d in range(7)]
+        )
+
+    def test_prices_follow_demand_within_bounds(self):
+        held = book_ticket(self.hot, user=self.admin)
+        with self.assertNumQueries(6):  # events, sales, bulk_update and history inside a savepoint
+            changes = pricing.reprice_events()
+        self.assertEqual({event_id: new for event_id, _, new in changes}, {self.hot.pk: 1100, self.cold.pk: 900})
+        self.new.refresh_from_db()
+        self.assertEqual((self.new.price, self.new.price_floor, self.new.price_ceiling), (1000, 700, 2000))
+        self.assertEqual(PriceHistory.objects.count(), 2)
+
+        for _ in range(20):
+            pricing.reprice_events()
+        self.hot.refresh_from_db()
+        self.cold.refresh_from_db()
+        self.assertEqual((self.hot.price, self.cold.price), (2000, 700))
+
+        # The hold keeps the price it was taken at
+        held.refresh_from_db()
+        self.assertEqual(held.amount_due, 1000)
+        self.assertEqual(book_ticket(self.hot, user=self.admin).price, 2000)
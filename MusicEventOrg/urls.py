@@ -21,6 +21,8 @@ urlpatterns = [
     path('api/register/', api_register, name='api_register'),
     path('api/login/', api_login, name='api_login'),
     path('api/logout/', api_logout, name='api_logout'),
+    path('api/cache-stats/', views.cache_stats, name='cache_stats'),
+    path('charts/sales/', views.SalesChartView.as_view(), name='sales_chart'),
 
     # Template Routes
     path('', views.home, name='home'),
@@ -34,6 +36,8 @@ urlpatterns = [
     path('event/<int:event_id>/book/', views.ticket_booking, name='ticket_booking'),
     path('payment/<int:ticket_id>/', views.initiate_payment, name='payment'),  # Fixed syntax
     path('qr-code/<int:ticket_id>/', views.scan_qr_code, name='qr_code'),
+    path('qr-code/scan/', views.scan_qr_code, name='scan_qr_code'),
+    path('qr-code/scan/batch/', views.scan_qr_code_batch, name='scan_qr_code_batch'),
 
     path('performers/', views.performers, name='performers'),
     path('performers/book/<int:performer_id>/', views.book_performer, name='book_performer'),
@@ -1,20 +1,25 @@
-import hashlib
 import qrcode
 from io import BytesIO
+from PIL import Image
 from django.conf import settings
 from django.core.files import File
-from django.core.mail import send_mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.utils.http import urlsafe_base64_encode
 from django.utils.encoding import force_bytes
 from django.contrib.auth.tokens import default_token_generator
+from MusicEventOrg.images import derivative_name
 from MusicEventOrg.models import Ticket
+from MusicEventOrg.notifications import queue_email
+from MusicEventOrg.ticket_tokens import sign_ticket
 
 
 def generate_qr_code(ticket_id):
-    ticket = Ticket.objects.get(id=ticket_id)
-    secret_key = "your-secret-key"
-    hash_value = hashlib.sha256(f"{ticket.id}{secret_key}".encode()).hexdigest()
-    qr_data = f"ticket_id:{ticket.id}&hash:{hash_value}"
+    ticket = Ticket.objects.select_related('event').get(id=ticket_id)
+    if not ticket.is_paid:
+        # The signed token is proof of purchase at the gate, so only paid tickets get one
+        return
+    qr_data = sign_ticket(ticket)
 
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
     qr.add_data(qr_data)
@@ -24,14 +29,27 @@ def generate_qr_code(ticket_id):
     buffer = BytesIO()
     img.save(buffer, format='PNG')
 
-    ticket.qr_code.save(f"ticket_{ticket.id}.png", File(buffer), save=True)
+    ticket.qr_code.save(f"ticket_{ticket.id}.png", File(buffer), save=False)
+    ticket.save(update_fields=['qr_code'])
+
+    # Small copy for the admin changelist, which would otherwise load every full-size code
+    size = settings.QR_THUMBNAIL_SIZE
+    buffer = BytesIO()
+    # Nearest-neighbour keeps the 1-bit palette, so the copy is smaller than the original rather than a greyscale PNG
+    img.get_image().resize((size, size), Image.NEAREST).save(buffer, format='PNG', optimize=True)
+    thumbnail = qr_thumbnail_name(ticket.qr_code.name)
+    default_storage.delete(thumbnail)
+    default_storage.save(thumbnail, ContentFile(buffer.getvalue()))
+
+
+def qr_thumbnail_name(name):
+    return derivative_name(name, settings.QR_THUMBNAIL_SIZE, 'png')
 
 def send_qr_code_email(user_email, qr_code_url):
-    send_mail(
+    queue_email(
+        user_email,
         'Your Ticket QR Code',
         f'Here is your ticket QR code: {qr_code_url}',
-        settings.DEFAULT_FROM_EMAIL,
-        [user_email],
     )
 def send_verification_email(user):
     token = default_token_generator.make_token(user)
@@ -39,11 +57,10 @@ def send_verification_email(user):
 
     # Generate verification link
     verification_link = f"http://yourdomain.com/verify-email/{uid}/{token}/"
-    send_mail(
+    queue_email(
+        user.email,
         'Verify Your Email',
         f'Click the link to verify your email: {verification_link}',
-        'noreply@yourdomain.com',
-        [user.email],
     )
 
 
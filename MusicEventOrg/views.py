@@ -6,47 +6,62 @@ from chartjs.views.lines import BaseLineChartView
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, login as auth_login, logout
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.contrib.auth.views import LogoutView
 from django.contrib.sites import requests
-from django.http import HttpResponse
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.utils.decorators import method_decorator
+from django.utils.functional import SimpleLazyObject
+from django.views.decorators.http import condition
+from django.db import transaction
+from django.core.paginator import Paginator
+from django.db.models import Count, Prefetch, Q
 from django.shortcuts import render, redirect, get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import viewsets, status, serializers
 from rest_framework.authtoken.models import Token
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.filters import OrderingFilter
 from rest_framework.generics import CreateAPIView
-from rest_framework.pagination import PageNumberPagination
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Venue, Event, Ticket, Payment, Review, Performer, Festival
+from . import caching, checkin, exports, ratings, rollups
+from .conditional import ConditionalGetMixin, make_etag
+from .fieldsets import SparseFieldsetMixin
+from .booking import SeatUnavailable, SoldOut, book_ticket, book_tickets
+from .models import Venue, Event, EventForecast, Ticket, Payment, Review, Performer, Festival
+from .pagination import KeysetPagination
 from .permission import IsOrganizerOrReadOnly
-from .serializers import (VenueSerializer, EventSerializer, TicketSerializer, PaymentSerializer, \
-                          ReviewSerializer, PerformerSerializer, FestivalSerializer, RegisterSerializer, LoginSerializer)
-from .sms import send_sms
-from .utils import generate_qr_code, send_verification_email, validate_qr_code
-from .payments import PaypalPayment
+from .search import EventSearchFilter
+from .seatmap import get_seat_map, seat_sections
+from .serializers import (VenueSerializer, EventSerializer, TicketSerializer, BulkTicketSerializer, PaymentSerializer, \
+                          ReviewSerializer, PerformerSerializer, FestivalSerializer, RegisterSerializer, LoginSerializer,
+                          EventForecastSerializer, expanded_fields)
+from .notifications import queue_sms
+from .jobs import enqueue, enqueue_many
+from .utils import send_verification_email, validate_qr_code
+from .payments import EsewaPayment, PaypalPayment
 
 logger = logging.getLogger(__name__)
 
 
 # --- API ViewSets ---
 
-class PerformerViewSet(viewsets.ModelViewSet):
+class PerformerViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Performer.objects.all()
     serializer_class = PerformerSerializer
     permission_classes = [IsAdminUser]
 
 
-class FestivalViewSet(viewsets.ModelViewSet):
-    queryset = Festival.objects.all()
+class FestivalViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Festival.objects.select_related('organizer')
     serializer_class = FestivalSerializer
 
     def get_permissions(self):
@@ -58,36 +73,75 @@ class FestivalViewSet(viewsets.ModelViewSet):
         serializer.save(organizer=self.request.user)
 
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    ordering = ['-created_at']
 
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            review = serializer.save(user=self.request.user)
+            ratings.review_added(review)
 
+    def perform_update(self, serializer):
+        old_event_id, old_rating = serializer.instance.event_id, serializer.instance.rating
+        with transaction.atomic():
+            review = serializer.save()
+            ratings.review_changed(old_event_id, old_rating, review)
 
-class VenueViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            instance.delete()
+            ratings.review_removed(instance)
+
+
+class VenueViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Venue.objects.all()
     serializer_class = VenueSerializer
+    permission_classes = [IsOrganizerOrReadOnly]
 
 
-class EventViewSet(viewsets.ModelViewSet):
-    queryset = Event.objects.all()
+class EventViewSet(SparseFieldsetMixin, ConditionalGetMixin, viewsets.ModelViewSet):
+    # Performers are serialized as ids: prefetch them in one query per page instead of one per event
+    queryset = Event.objects.prefetch_related(Prefetch('performers', queryset=Performer.objects.only('id')))
     serializer_class = EventSerializer
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['venue', 'date']
-    search_fields = ['title', 'description']
+    permission_classes = [IsOrganizerOrReadOnly]  # the event catalogue is public, edits are for staff
+    filter_backends = [DjangoFilterBackend, EventSearchFilter, OrderingFilter]
+    filterset_fields = {'venue': ['exact'], 'date': ['exact', 'gte']}
     ordering_fields = ['date', 'price']
-    pagination_class = PageNumberPagination
+    pagination_class = KeysetPagination
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAdminUser])
+    def forecast(self, request, pk=None):
+        """Projected sell-out date and final attendance, as of the last forecast_sales run."""
+        forecast = get_object_or_404(EventForecast, event_id=pk)
+        return Response(EventForecastSerializer(forecast).data)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def forecasts(self, request):
+        """Forecasts of all upcoming events, keyset-paginated like the event list."""
+        queryset = EventForecast.objects.filter(event__date__gt=timezone.now())
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(EventForecastSerializer(page, many=True).data)
 
-class TicketViewSet(viewsets.ModelViewSet):
+
+class TicketViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Ticket.objects.all()
     serializer_class = TicketSerializer
+    pagination_class = KeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if 'event' in expanded_fields({'request': self.request}):
+            queryset = queryset.select_related('event').prefetch_related(
+                Prefetch('event__performers', queryset=Performer.objects.only('id'))
+            )
+        return queryset
 
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'bulk', 'update', 'partial_update', 'destroy', 'export', 'attendees']:
             return [IsAdminUser()]
         return [AllowAny()]
 
@@ -103,29 +157,95 @@ class TicketViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         event = serializer.validated_data['event']
-        if event.available_seats <= 0:
+        try:
+            with transaction.atomic():
+                ticket = book_ticket(**serializer.validated_data)
+                if ticket.is_paid:
+                    enqueue('generate_qr_code', ticket_id=ticket.id)
+                user_phone = getattr(ticket.user, 'profile', None)
+                if user_phone:
+                    queue_sms(user_phone.phone_number, f"Your ticket for {event.title} has been booked successfully!")
+        except SoldOut:
             logger.warning(f"No seats available for event {event.id}")
             return Response({"error": "No seats available"}, status=status.HTTP_400_BAD_REQUEST)
-        ticket = serializer.save()
-        generate_qr_code(ticket.id)
-        user_phone = getattr(ticket.user, 'profile', None)
-        if user_phone:
-            send_sms(user_phone.phone_number, f"Your ticket for {ticket.event.title} has been booked successfully!")
-        event.available_seats -= 1
-        event.save()
-        logger.info(f"Ticket created for user {ticket.user.id} and event {event.id}")
+        except SeatUnavailable as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        serializer.instance = ticket
+        logger.info(f"Ticket created for user {ticket.user_id} and event {event.id}")
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
-
-class PaymentViewSet(viewsets.ModelViewSet):
+    @swagger_auto_schema(
+        operation_description="Book several tickets for one event in a single all-or-nothing request",
+        tags=['Tickets'],
+        request_body=BulkTicketSerializer,
+        responses={
+            201: "Tickets created successfully.",
+            400: "Invalid data, seat taken or not enough seats available.",
+        }
+    )
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        serializer = BulkTicketSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        event = data['event']
+        try:
+            with transaction.atomic():
+                tickets = book_tickets(event, user=data.get('user'), seat_numbers=data.get('seat_numbers'),
+                                       quantity=data.get('quantity'), is_paid=data['is_paid'])
+                if data['is_paid']:
+                    enqueue_many('generate_qr_code', [{'ticket_id': ticket.id} for ticket in tickets])
+                user_phone = getattr(data.get('user'), 'profile', None)
+                if user_phone:
+                    queue_sms(user_phone.phone_number,
+                              f"Your {len(tickets)} tickets for {event.title} have been booked successfully!")
+        except SoldOut:
+            logger.warning(f"Not enough seats available for event {event.id}")
+            return Response({"error": "Not enough seats available"}, status=status.HTTP_400_BAD_REQUEST)
+        except SeatUnavailable as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        logger.info(f"{len(tickets)} tickets created in bulk for event {event.id}")
+        return Response(self.get_serializer(tickets, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Stream every matching ticket as ?output=csv|jsonl. Filters: ?event=, ?festival=,
+        ?payment_method= and ?date_from=/?date_to= (event date, YYYY-MM-DD).
+        """
+        return export_view(request, 'tickets')
+
+    @action(detail=False, methods=['get'])
+    def attendees(self, request):
+        """Attendee list (paid tickets) for the door or the organizer; same filters as export."""
+        return export_view(request, 'attendees')
+
+
+class PaymentViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
     permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+    ordering = ['-timestamp']
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream every matching payment as ?output=csv|jsonl; filters as for ticket exports."""
+        return export_view(request, 'payments')
+
+
+def export_view(request, export):
+    output = request.query_params.get('output', 'csv')
+    if output not in exports.FORMATS:
+        raise serializers.ValidationError({'output': f"Choose one of {', '.join(exports.FORMATS)}."})
+    queryset = exports.apply_filters(exports.queryset_for(export), export, request.query_params)
+    return exports.export_response(queryset, export, output)
 
 
 # --- API Auth Views ---
 
 @api_view(['POST'])
+@permission_classes([AllowAny])
 def api_register(request):
     serializer = RegisterSerializer(data=request.data)
     if serializer.is_valid():
@@ -137,6 +257,7 @@ def api_register(request):
 
 
 @api_view(['POST'])
+@permission_classes([AllowAny])
 def api_login(request):
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
@@ -161,12 +282,51 @@ def api_logout(request):
     return Response({'message': 'Logged out successfully'}, status=status.HTTP_200_OK)
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    # Counters are per process: this reports the worker that served the request
+    return Response(caching.hit_rate())
+
+
+@method_decorator(staff_member_required, name='dispatch')
+class SalesChartView(BaseLineChartView):
+    """
+    Chart.js data for ticket sales: ?metric=tickets|revenue, ?group=total|event|festival|payment_method,
+    ?days=30 and optionally ?event=<id> or ?festival=<id>. Served from the daily sales rollups.
+    """
+
+    def get(self, request, *args, **kwargs):
+        metric = request.GET.get('metric', 'tickets')
+        group = request.GET.get('group', 'total')
+        try:
+            days = int(request.GET.get('days', 30))
+            filters = {f'{name}_id' if name == 'event' else 'event__festival_id': int(request.GET[name])
+                       for name in ('event', 'festival') if request.GET.get(name)}
+        except ValueError:
+            return HttpResponseBadRequest('days, event and festival must be integers')
+        if metric not in rollups.METRICS or group not in rollups.GROUPS or not 1 <= days <= 366:
+            return HttpResponseBadRequest('Unknown metric or group, or days outside 1-366')
+        self.labels, self.providers, self.data = rollups.daily_series(metric, group, days, **filters)
+        return super().get(request, *args, **kwargs)
+
+    def get_labels(self):
+        return [day.isoformat() for day in self.labels]
+
+    def get_providers(self):
+        return self.providers
+
+    def get_data(self):
+        return self.data
+
+
 # --- Template Views ---
 
 def home(request):
-    events = Event.objects.filter(date__gte=timezone.now()).order_by('date')[:6]
-    featured_event = events.first()  # First upcoming event for hero countdown
-    featured_event_iso = featured_event.date.isoformat() if featured_event else None
+    # Lazy: only evaluated when the cached home page fragments have to be re-rendered
+    events = Event.objects.filter(date__gte=timezone.now()).select_related('venue').order_by('date')[:6]
+    featured_event = SimpleLazyObject(lambda: events[0] if events else None)  # First upcoming event for hero countdown
+    featured_event_iso = SimpleLazyObject(lambda: featured_event.date.isoformat() if featured_event else None)
     return render(request, 'home.html', {
         'events': events,
         'featured_event': featured_event,
@@ -174,38 +334,63 @@ def home(request):
     })
 
 
+def event_page_etag(request, event_id):
+    updated_at = Event.objects.filter(pk=event_id).values_list('updated_at', flat=True).first()
+    # The page depends on who is logged in; pending flash messages must be rendered, not answered with 304
+    if updated_at is None or len(messages.get_messages(request)):
+        return None
+    return make_etag(updated_at, request.user.pk)
+
+
+@condition(etag_func=event_page_etag)
 def event_details(request, event_id):
-    event = get_object_or_404(Event, id=event_id)
+    event = get_object_or_404(Event.objects.select_related('venue'), id=event_id)
     return render(request, 'event_details_page.html', {'event': event})
 
 
 @login_required
 def ticket_booking(request, event_id):
     event = get_object_or_404(Event, id=event_id)
-    available_seats = ['A1', 'A2', 'B1', 'B2']  # Replace with dynamic logic
 
     if request.method == 'POST':
-        selected_seat = request.POST.get('seat')
-        # Save the booking details to the database (add your logic here)
-        # For example:
-        # Ticket.objects.create(user=request.user, event=event, seat=selected_seat)
-
-        # Add a success message
-        messages.success(request, f"You have successfully booked seat {selected_seat} for {event.title}!")
-
-        # Redirect to the home page or another appropriate page
-        return redirect('home')
+        selected_seat = request.POST.get('seat', '')
+        try:
+            ticket = book_ticket(event, user=request.user, seat_number=selected_seat)
+        except SoldOut:
+            messages.error(request, f"Sorry, {event.title} is sold out.")
+            return redirect('event_details', event_id=event.id)
+        except SeatUnavailable:
+            messages.error(request, f"Seat {selected_seat} is no longer available, please pick another.")
+            return redirect('ticket_booking', event_id=event.id)
 
-    return render(request, 'ticket_booking.html', {'event': event, 'available_seats': available_seats})
+        # The seat is only held until the payment completes
+        held_until = timezone.localtime(ticket.hold_expires_at).strftime('%H:%M')
+        held = f"Seat {selected_seat}" if selected_seat else f"Your ticket for {event.title}"
+        messages.success(request, f"{held} held until {held_until} — complete payment to keep it.")
+        return redirect('payment', ticket_id=ticket.id)
 
+    seat_map = get_seat_map(event)
+    return render(request, 'ticket_booking.html', {'event': event, 'sections': seat_sections(seat_map)})
 
 
+PERFORMERS_PER_PAGE = 24
 
 
 def performers(request):
-    performers = Performer.objects.all()
-    events = Event.objects.filter(date__gte=timezone.now())  # Get upcoming events for the booking modal
-    return render(request, 'performers.html', {'performers': performers, 'events': events})
+    query = request.GET.get('q', '').strip()
+    performers = Performer.objects.annotate(
+        upcoming_events=Count('events', filter=Q(events__date__gte=timezone.now()))
+    ).order_by('name', 'pk')
+    if query:
+        performers = performers.filter(name__icontains=query)
+    # The booking modal loads its events from the events API when opened
+    page = Paginator(performers, PERFORMERS_PER_PAGE).get_page(request.GET.get('page'))
+    return render(request, 'performers.html', {
+        'page_obj': page,
+        'performers': page.object_list,
+        'query': query,
+        'fragment_generation': caching.generation('performers'),
+    })
 
 
 @login_required
@@ -280,20 +465,22 @@ def logout_view(request):
 
 # --- Payment Views ---
 
-def initiate_payment(request):
-    # Payment details
-    amount = 100  # Replace with dynamic amount
-    transaction_id = "TXN123456"  # Generate a unique transaction ID
-    total_amount = amount  # Total amount including taxes (if any)
-
+@login_required
+def initiate_payment(request, ticket_id):
+    ticket = get_object_or_404(Ticket.objects.select_related('event'), id=ticket_id, user=request.user)
+    if ticket.is_paid:
+        messages.info(request, "This ticket is already paid.")
+        return redirect('home')
+    # Renews the hold, so the seat is kept while the customer is at eSewa
+    result = EsewaPayment.initiate_payment(ticket.id)
+    if "error" in result:
+        messages.error(request, result["error"])
+        return redirect('event_details', event_id=ticket.event_id)
+    ticket.refresh_from_db(fields=['hold_expires_at'])
     context = {
-        'esewa_payment_url': settings.ESEWA_CONFIG['payment_url'],
-        'amount': amount,
-        'total_amount': total_amount,
-        'transaction_id': transaction_id,
-        'merchant_code': settings.ESEWA_CONFIG['merchant_code'],
-        'success_url': settings.ESEWA_CONFIG['callback_url'] + '?q=su',
-        'failure_url': settings.ESEWA_CONFIG['callback_url'] + '?q=fu',
+        'ticket': ticket,
+        'esewa_payment_url': result['payment_url'],
+        'esewa_fields': result['data'],
     }
     return render(request, 'payment_form.html', context)
 
@@ -326,17 +513,49 @@ def payment_callback(request):
         return HttpResponse("Invalid Callback!")
 
 
-@api_view(['POST'])
-def scan_qr_code(request):
-    ticket_id = request.data.get('ticket_id')
+CHECKIN_STATUS_CODES = {
+    checkin.INVALID: status.HTTP_400_BAD_REQUEST,
+    checkin.WRONG_EVENT: status.HTTP_400_BAD_REQUEST,
+    checkin.DUPLICATE: status.HTTP_409_CONFLICT,
+}
+MAX_CHECKIN_BATCH = 100
 
+
+def gate_event_id(request):
+    """The event a gate device is scanning for, if it says so."""
+    try:
+        return int(request.data['event_id'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])  # gate devices sign in with staff accounts
+def scan_qr_code(request, ticket_id=None):
+    token = request.data.get('token')
+    if token:
+        # Signed QR codes are checked from the token alone and admitted through the in-memory check-in registry
+        result = checkin.registry.check_in(token, event_id=gate_event_id(request))
+        if result['status'] != checkin.ADMITTED:
+            return Response(result, status=CHECKIN_STATUS_CODES[result['status']])
+        return Response({"message": "Ticket is valid.", "details": result}, status=status.HTTP_200_OK)
+
+    ticket_id = ticket_id or request.data.get('ticket_id')
     try:
-        ticket = Ticket.objects.get(id=ticket_id)
-    except Ticket.DoesNotExist:
+        ticket = Ticket.objects.select_related('user', 'event').get(id=ticket_id)
+    except (Ticket.DoesNotExist, ValueError):
         return Response({"error": "Invalid ticket."}, status=status.HTTP_404_NOT_FOUND)
 
     if not ticket.is_paid:
         return Response({"error": "Ticket has not been paid."}, status=status.HTTP_400_BAD_REQUEST)
+    event_id = gate_event_id(request)
+    if event_id is not None and ticket.event_id != event_id:
+        return Response({"status": checkin.WRONG_EVENT, "error": "Ticket is for a different event."},
+                        status=CHECKIN_STATUS_CODES[checkin.WRONG_EVENT])
+    # Scans by ticket id go through the same registry as signed tokens, so a ticket still gets in only once
+    if not checkin.registry.admit(ticket.event_id, ticket.pk):
+        return Response({"status": checkin.DUPLICATE, "error": "Ticket has already been used."},
+                        status=CHECKIN_STATUS_CODES[checkin.DUPLICATE])
 
     return Response({
         "message": "Ticket is valid.",
@@ -348,6 +567,25 @@ def scan_qr_code(request):
     }, status=status.HTTP_200_OK)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def scan_qr_code_batch(request):
+    """Check in up to MAX_CHECKIN_BATCH tokens from one gate device in a single request."""
+    tokens = request.data.get('tokens')
+    if not isinstance(tokens, list) or not tokens:
+        return Response({"error": "tokens must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(tokens) > MAX_CHECKIN_BATCH:
+        return Response({"error": f"At most {MAX_CHECKIN_BATCH} tokens per request"},
+                        status=status.HTTP_400_BAD_REQUEST)
+    event_id = gate_event_id(request)
+    results = [checkin.registry.check_in(str(token), event_id=event_id) for token in tokens]
+    checkin.registry.maybe_flush()
+    return Response({
+        "admitted": sum(result['status'] == checkin.ADMITTED for result in results),
+        "results": results,
+    }, status=status.HTTP_200_OK)
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def initiate_paypal_payment_view(request):
@@ -375,6 +613,7 @@ def initiate_paypal_payment_view(request):
 
 
 @api_view(['GET'])
+@permission_classes([AllowAny])  # PayPal redirects here; the payment itself is verified with PayPal
 def paypal_callback_view(request):
     status = request.GET.get('status')
     payment_id = request.GET.get('paymentId')